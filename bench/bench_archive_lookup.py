@@ -0,0 +1,55 @@
+# bench/bench_archive_lookup.py
+# DownloadArchive'ni N ta yozuv bilan yuklash va tekshirish narxini o'lchaydi
+#   python bench/bench_archive_lookup.py [yozuvlar_soni]
+
+import os
+import sys
+import random
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from engine import DownloadArchive
+
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+
+
+def video_id(rng):
+    return "".join(rng.choice(ALPHABET) for _ in range(11))
+
+
+def run(entries):
+    rng = random.Random(42)
+    ids = [f"youtube {video_id(rng)}" for _ in range(entries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "archive.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("".join(i + "\n" for i in ids))
+
+        # Fayl konstruktorda emas, birinchi murojaatda o'qiladi — o'qishni ham o'lchaymiz
+        start = time.perf_counter()
+        archive = DownloadArchive(path)
+        archive.load()
+        load = time.perf_counter() - start
+
+        n = min(50_000, entries)
+        probes = rng.sample(ids, n) + [f"youtube {video_id(rng)}" for _ in range(n)]
+        start = time.perf_counter()
+        hits = sum(1 for p in probes if p in archive)
+        lookup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(1000):
+            archive.add(f"youtube {video_id(rng)}")
+        append = time.perf_counter() - start
+
+    print(f"Yozuvlar: {len(archive) - 1000}")
+    print(f"Yuklash: {load:.2f} s")
+    print(f"Tekshirish: {lookup / len(probes) * 1e9:.0f} ns/so'rov ({hits} ta topildi)")
+    print(f"Qo'shish: {append / 1000 * 1e6:.1f} µs/yozuv")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,78 @@
+# bench/bench_disk_fallback.py
+# Diskda joy tor bo'lganda keshdagi info'dan yuklash 403 olib, qayta extract qilinadigan yo'l:
+# job before_dl'da joyni ikkinchi marta so'raydi. DiskSpaceGate shu job'ning oldingi ulushini
+# "boshqa job band qilgan" deb hisoblasa, job o'zini kutib qotib qoladi. Zaxira (reserve)
+# shunday tanlanadiki, bo'sh joy bitta ulushga yetadi, ikkitasiga yetmaydi.
+#   python bench/bench_disk_fallback.py [--size-mb 8] [--timeout 30]
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from engine import ContentStore, DownloadEngine, MetadataCache, StageTracer, estimate_disk_usage
+from media_server import MediaServer, synthetic_file
+from bench_suite import QuietLogger
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=30.0, help="yuklash shu vaqtda tugamasa — qotib qolgan")
+    args = parser.parse_args()
+
+    data = synthetic_file(args.size_mb * 1024 * 1024)
+    states = []
+    with tempfile.TemporaryDirectory() as tmp, \
+            MediaServer({"/clip.mp4": (data, "video/mp4")}, forbidden={"/expired.mp4"}) as server:
+        out = os.path.join(tmp, "out")
+        os.makedirs(out)
+        engine = DownloadEngine(archive=set(), on_state=lambda job: states.append(job.state),
+                                make_logger=lambda job: QuietLogger(), tracer=StageTracer(path=None),
+                                store=ContentStore(root=None))
+        engine.info_cache = MetadataCache(cache_dir=os.path.join(tmp, "cache"))
+
+        # Keshdagi extractor natijasi: hajmi ma'lum, lekin stream URL'i endi 403 qaytaradi
+        url = server.url("/clip.mp4")
+        engine.fetch_info(url)
+        info = engine.info_cache.get_metadata(url)
+        for fmt in info.get('formats') or [info]:
+            fmt['url'] = server.url("/expired.mp4")
+            fmt['filesize'] = len(data)
+        engine.info_cache.put(url, info)
+
+        need, _ = estimate_disk_usage({'filesize': len(data)}, "video")
+        engine.disk.reserve = shutil.disk_usage(out).free - need - need // 2
+        print(f"{args.size_mb} MiB, band qilinadi ~{need / 2 ** 20:.1f} MiB, "
+              f"zaxiradan keyin bo'sh ~{(need + need // 2) / 2 ** 20:.1f} MiB")
+
+        job = engine.submit(url, "video", out)
+        began = time.perf_counter()
+        waiter = threading.Thread(target=engine.wait, daemon=True)
+        waiter.start()
+        waiter.join(args.timeout)
+        elapsed = time.perf_counter() - began
+
+        if waiter.is_alive():
+            print(f"XATO: {args.timeout:.0f} s ichida tugamadi (holat: {job.state}, "
+                  f"band qilingan: {engine.disk.held() / 2 ** 20:.1f} MiB)")
+            sys.stdout.flush()
+            os._exit(1)   # worker thread DiskSpaceGate'da qotgan, jarayonni boshqa yo'l bilan to'xtatib bo'lmaydi
+        print(f"Holatlar: {' → '.join(states)}")
+        print(f"Vaqt: {elapsed:.2f} s, band qilingan joy qoldi: {engine.disk.held()} bayt")
+        if job.state != "done":
+            print(f"XATO: yuklash muvaffaqiyatsiz: {job.error}")
+            return 1
+        if engine.disk.held():
+            print("XATO: job tugagach ham joy band bo'lib qoldi")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
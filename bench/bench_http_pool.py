@@ -0,0 +1,89 @@
+# bench/bench_http_pool.py
+# Umumiy HttpPool'ni (engine.py) lokal TLS serverda tekshiradi: N ta ketma-ket so'rov
+# uchun nechta TLS handshake bo'lgani va o'rtacha kechikish. Taqqoslash uchun oldingi
+# holat: har safar oddiy requests.get() va har bir job uchun yangi YoutubeDL.
+#   python bench/bench_http_pool.py [--requests 50] [--size-kb 32]
+# Self-signed sertifikat uchun openssl kerak.
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from engine import HttpPool
+from media_server import MediaServer, synthetic_file
+
+
+def make_certificate(folder):
+    cert, key = os.path.join(folder, "cert.pem"), os.path.join(folder, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-keyout", key, "-out", cert, "-subj", "/CN=127.0.0.1",
+                    "-addext", "subjectAltName=IP:127.0.0.1"], check=True, capture_output=True)
+    return cert, key
+
+
+def measure(server, count, fetch):
+    before = server.connections
+    start = time.perf_counter()
+    for _ in range(count):
+        fetch()
+    elapsed = time.perf_counter() - start
+    return server.connections - before, elapsed * 1000 / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--size-kb", type=int, default=32, help="javob hajmi (thumbnail kabi)")
+    args = parser.parse_args()
+
+    import requests
+    from segmented import SegmentedYoutubeDL
+
+    # Bu o'zgaruvchilar requests'da Session.verify'dan ustun turadi
+    for name in ("REQUESTS_CA_BUNDLE", "CURL_CA_BUNDLE"):
+        os.environ.pop(name, None)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = make_certificate(tmp)
+        files = {"/thumb.jpg": (synthetic_file(args.size_kb * 1024), "image/jpeg")}
+        with MediaServer(files, certfile=cert, keyfile=key) as server:
+            url = server.url("/thumb.jpg")
+            pool = HttpPool(verify=cert)
+
+            def bare_get():
+                requests.get(url, verify=cert, timeout=10).content
+
+            def pooled_get():
+                pool.session().get(url, timeout=10).content
+
+            def ydl_fetch(opts):
+                with SegmentedYoutubeDL({'quiet': True, 'nocheckcertificate': True, **opts}) as ydl:
+                    with ydl.urlopen(url) as response:
+                        response.read()
+
+            rows = [
+                ("requests.get()", measure(server, args.requests, bare_get)),
+                ("HttpPool.session()", measure(server, args.requests, pooled_get)),
+                ("YoutubeDL (har job uchun)", measure(server, args.requests, lambda: ydl_fetch({}))),
+                ("YoutubeDL + HttpPool", measure(server, args.requests, lambda: ydl_fetch({'http_pool': pool}))),
+            ]
+            pool.close()
+
+    print(f"{args.requests} ta so'rov, {args.size_kb} KiB javob:")
+    for name, (handshakes, latency_ms) in rows:
+        print(f"  {name:<28} handshake: {handshakes:>4}   o'rtacha: {latency_ms:6.2f} ms")
+
+    # Umumiy pul ketma-ket so'rovlar uchun bitta ulanishni qayta ishlatishi kerak
+    failed = rows[1][1][0] > 1 or rows[3][1][0] > 1
+    if failed:
+        print("XATO: HttpPool ulanishlarni qayta ishlatmadi")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
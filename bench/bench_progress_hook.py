@@ -0,0 +1,41 @@
+# bench/bench_progress_hook.py
+# Engine progress hook'ining bitta yt-dlp progress chaqiruviga ketadigan vaqtini o'lchaydi
+#   python bench/bench_progress_hook.py [chaqiruvlar_soni]
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from engine import ContentStore, DownloadEngine, DownloadJob, MetadataCache, ProgressAggregator, StageTracer
+
+
+def run(calls, tmp):
+    job = DownloadJob("https://youtu.be/bench", "video", tmp, "720p")
+    job.state = "downloading"
+    agg = ProgressAggregator()
+    # Span'lar, kesh va ombor foydalanuvchi papkalariga yozilmaydi
+    engine = DownloadEngine(archive=set(), on_progress=agg.update, tracer=StageTracer(path=None),
+                            store=ContentStore(root=None))
+    engine.info_cache = MetadataCache(cache_dir=os.path.join(tmp, "cache"))
+    hook = engine._progress_hook
+
+    total = 500 * 1024 * 1024
+    d = {'status': 'downloading', 'downloaded_bytes': 0, 'total_bytes': total,
+         '_percent_str': '\x1b[0;94m  0.0%\x1b[0m'}
+
+    start = time.perf_counter()
+    for i in range(calls):
+        d['downloaded_bytes'] = i * 16384
+        hook(job, d)
+    elapsed = time.perf_counter() - start
+
+    print(f"{calls} ta chaqiruv: {elapsed:.3f} s, {elapsed / calls * 1e9:.0f} ns/chaqiruv")
+    print(f"GUI'ga chiqariladigan holatlar: {len(agg.drain())}")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000, tmp)
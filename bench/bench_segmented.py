@@ -0,0 +1,73 @@
+# bench/bench_segmented.py
+# Bo'laklab yuklashni (segmented.py) lokal, Range qo'llaydigan va har bir ulanish
+# tezligi cheklangan serverda tekshiradi: fayl baytma-bayt to'g'ri bo'lishi va
+# N ta ulanish bitta ulanishdan tezroq bo'lishi kerak.
+#   python bench/bench_segmented.py [--size-mb 32] [--rate-kb 4096] [--connections 1 4 8]
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from engine import ContentStore, DownloadEngine, MetadataCache, StageTracer
+from media_server import MediaServer, synthetic_file
+
+
+def run_once(url, connections, chunk_size, out_folder):
+    engine = DownloadEngine(archive=set(), segment_connections=connections, segment_chunk_size=chunk_size,
+                            store=ContentStore(root=None), tracer=StageTracer(path=None),
+                            make_logger=lambda job: QuietLogger())
+    # Foydalanuvchining metadata keshiga tegmaymiz; har o'lchov qaytadan extract qiladi
+    engine.info_cache = MetadataCache(cache_dir=os.path.join(out_folder, ".cache"))
+    start = time.perf_counter()
+    job = engine.submit(url, "video", out_folder, "Eng yuqori sifat")
+    engine.wait()
+    elapsed = time.perf_counter() - start
+    if job.state != "done":
+        raise SystemExit(f"yuklash muvaffaqiyatsiz: {job.error}")
+    return elapsed
+
+
+class QuietLogger:
+    def debug(self, msg):
+        pass
+
+    info = warning = debug
+
+    def error(self, msg):
+        print(msg, file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=32)
+    parser.add_argument("--rate-kb", type=int, default=4096, help="bitta ulanish tezligi (KiB/s)")
+    parser.add_argument("--chunk-mb", type=int, default=4)
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    data = synthetic_file(args.size_mb * 1024 * 1024)
+    expected = hashlib.sha256(data).hexdigest()
+    failed = False
+
+    with MediaServer({"/clip.mp4": (data, "video/mp4")}, rate=args.rate_kb * 1024) as server:
+        for connections in args.connections:
+            with tempfile.TemporaryDirectory() as tmp:
+                before = server.range_requests
+                elapsed = run_once(server.url("/clip.mp4"), connections, args.chunk_mb * 1024 * 1024, tmp)
+                path = os.path.join(tmp, "clip.mp4")
+                with open(path, "rb") as f:
+                    ok = hashlib.sha256(f.read()).hexdigest() == expected
+                failed |= not ok
+                print(f"{connections:>2} ulanish: {elapsed:6.2f} s, {args.size_mb / elapsed:7.1f} MiB/s, "
+                      f"Range so'rovlari: {server.range_requests - before:>3}, sha256 {'OK' if ok else 'XATO'}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# bench/bench_startup.py
+# main.py'ning sovuq startini o'lchaydi:
+#   1) python -X importtime bo'yicha "import main" narxi va eng og'ir modullar
+#   2) jarayon ishga tushganidan birinchi kadr chizilguncha vaqt (display kerak)
+#   python bench/bench_startup.py [--max-import-ms 300] [--max-frame-ms 1500]
+
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Startup'da yuklanmasligi kerak bo'lgan og'ir modullar
+LAZY_MODULES = ("yt_dlp", "PIL", "requests")
+
+# Faqat birinchi kadr o'lchanadi: _after_first_frame (jurnaldagi yuklashlarni davom ettirish,
+# warm_up, update tekshiruvi) o'chiriladi
+FIRST_FRAME_SNIPPET = """
+import time, tkinter as tk
+import main
+main.YouTubeDownloaderApp._after_first_frame = lambda self: None
+root = tk.Tk()
+app = main.YouTubeDownloaderApp(root)
+def done():
+    root.update_idletasks()
+    print(time.time())
+    root.destroy()
+root.after_idle(done)
+root.mainloop()
+"""
+
+
+def measure_imports():
+    code = "import sys, main; print(','.join(m for m in %r if m in sys.modules))" % (LAZY_MODULES,)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return rows, loaded
+
+
+def measure_first_frame():
+    # Ilova ma'lumotlari (APP_DATA_DIR: jurnal, loglar, keshlar) vaqtinchalik papkada —
+    # foydalanuvchining haqiqiy profiliga tegilmaydi
+    profile = tempfile.mkdtemp(prefix="ytd-bench-")
+    env = dict(os.environ, LOCALAPPDATA=profile, HOME=profile)
+    try:
+        start = time.time()
+        proc = subprocess.run([sys.executable, "-c", FIRST_FRAME_SNIPPET], cwd=ROOT, env=env,
+                              capture_output=True, text=True)
+    finally:
+        shutil.rmtree(profile, ignore_errors=True)
+    if proc.returncode != 0:
+        return None, proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "xato"
+    return (float(proc.stdout.strip().splitlines()[-1]) - start) * 1000, None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-frame-ms", type=float, default=None)
+    args = parser.parse_args()
+    failed = False
+
+    rows, loaded = measure_imports()
+    main_row = next((r for r in rows if r[2] == "main"), None)
+    import_ms = main_row[0] / 1000 if main_row else 0.0
+    print(f"import main: {import_ms:.1f} ms")
+    for cumulative, _, name in sorted(rows, reverse=True)[:10]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+    if loaded:
+        print(f"XATO: startup'da og'ir modullar yuklangan: {', '.join(loaded)}")
+        failed = True
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print(f"XATO: import {import_ms:.1f} ms > {args.max_import_ms} ms")
+        failed = True
+
+    frame_ms, err = measure_first_frame()
+    if frame_ms is None:
+        print(f"Birinchi kadr: o'lchanmadi ({err})")
+    else:
+        print(f"Birinchi kadr: {frame_ms:.0f} ms")
+        if args.max_frame_ms is not None and frame_ms > args.max_frame_ms:
+            print(f"XATO: birinchi kadr {frame_ms:.0f} ms > {args.max_frame_ms} ms")
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+# bench/bench_suite.py
+# Engine benchmark'i lokal serverda (media_server.py): ffmpeg bilan yasalgan haqiqiy
+# mp4/m4a fayllar va ularni sanab beradigan DASH manifest. yt-dlp'ning generic extractor'i
+# manifestni o'qiydi, shuning uchun build_ydl_opts() dagi har bir sifat uchun format tanlash,
+# merge va mp3 kodlash haqiqiy yo'ldan o'tadi. Har bir holat alohida jarayonda ishlaydi —
+# peak RSS va CPU boshqa holatlar bilan aralashmasin.
+#   python bench/bench_suite.py [--duration 20] [--rate-kb 0] [--latency-ms 0] [--no-ranges]
+#                         [--repeat 3] [--cases video-720p audio-mp3] [--json out.json]
+#                         [--baseline old.json] [--tolerance 15]
+# Natija JSON'i keyingi relizda --baseline sifatida berilsa, yomonlashgan ko'rsatkichlar belgilanadi.
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from engine import BEST_QUALITY, ContentStore, DownloadEngine, MetadataCache, StageTracer
+from media_server import MediaServer
+
+# Sifat → (kenglik, video bitrate). Shovqinli testsrc2 siqilmaydi, fayl hajmi bitrate'ga yaqin
+VIDEO_RENDITIONS = {360: (640, "800k"), 720: (1280, "2500k"), 1080: (1920, "5000k")}
+AUDIO_BITRATE = "128k"
+FRAGMENTED = "frag_keyframe+empty_moov+default_base_moof"   # DASH'dagi kabi fragmentli mp4
+
+CASES = {
+    "video-360p":  ("video", "360p"),
+    "video-720p":  ("video", "720p"),
+    "video-1080p": ("video", "1080p"),
+    "video-best":  ("video", BEST_QUALITY),
+    "audio-mp3":   ("audio", None),
+}
+
+# Ko'rsatkich → True bo'lsa kattasi yaxshi
+METRICS = {
+    "throughput_mib_s": True,
+    "ttfb_ms":          False,
+    "extract_ms":       False,
+    "postprocess_ms":   False,
+    "total_ms":         False,
+    "cpu_s_per_mib":    False,
+    "peak_rss_mib":     False,
+}
+
+MPD_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" minBufferTime="PT2S"
+     mediaPresentationDuration="PT{duration}S" profiles="urn:mpeg:dash:profile:isoff-on-demand:2011">
+  <Period>
+    <AdaptationSet contentType="video" mimeType="video/mp4">
+{videos}
+    </AdaptationSet>
+    <AdaptationSet contentType="audio" mimeType="audio/mp4" lang="en">
+      <Representation id="audio" bandwidth="{audio_bandwidth}" codecs="mp4a.40.2" audioSamplingRate="44100">
+        <BaseURL>audio.m4a</BaseURL>
+      </Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+VIDEO_REPRESENTATION = """      <Representation id="v{height}" bandwidth="{bandwidth}" width="{width}" height="{height}" codecs="avc1.64001f" frameRate="30">
+        <BaseURL>v{height}.mp4</BaseURL>
+      </Representation>"""
+
+
+def bitrate(value):
+    return int(value.rstrip("k")) * 1000
+
+
+# Fayllar media_dir'da saqlanadi va keyingi ishga tushirishda qayta ishlatiladi
+def make_media(media_dir, duration):
+    from transcode import ffmpeg_executable
+
+    ffmpeg = ffmpeg_executable()
+    if ffmpeg is None:
+        raise SystemExit("ffmpeg topilmadi: benchmark uchun media fayllar yasab bo'lmaydi")
+    os.makedirs(media_dir, exist_ok=True)
+
+    def render(name, args):
+        path = os.path.join(media_dir, f"{duration}s-{name}")
+        if not os.path.exists(path):
+            tmp_path = path + ".tmp"
+            subprocess.run([ffmpeg, "-v", "error", "-y", *args, "-t", str(duration),
+                            "-movflags", FRAGMENTED, "-f", "mp4", tmp_path], check=True)
+            os.replace(tmp_path, path)
+        with open(path, "rb") as f:
+            return f.read()
+
+    files = {}
+    for height, (width, rate) in VIDEO_RENDITIONS.items():
+        data = render(f"v{height}.mp4", [
+            "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate=30,noise=alls=30:allf=t",
+            "-c:v", "libx264", "-preset", "ultrafast", "-b:v", rate, "-an"])
+        files[f"/v{height}.mp4"] = (data, "video/mp4")
+    data = render("audio.m4a", ["-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+                                "-c:a", "aac", "-b:a", AUDIO_BITRATE, "-vn"])
+    files["/audio.m4a"] = (data, "audio/mp4")
+
+    videos = "\n".join(VIDEO_REPRESENTATION.format(height=h, width=w, bandwidth=bitrate(r))
+                       for h, (w, r) in VIDEO_RENDITIONS.items())
+    manifest = MPD_TEMPLATE.format(duration=duration, videos=videos, audio_bandwidth=bitrate(AUDIO_BITRATE))
+    files["/clip.mpd"] = (manifest.encode("utf-8"), "application/dash+xml")
+    return files
+
+
+class QuietLogger:
+    def debug(self, msg):
+        pass
+
+    info = warning = debug
+
+    def error(self, msg):
+        print(msg, file=sys.stderr)
+
+
+# ────────────────────────────────────────────────
+# Bitta holat (alohida jarayonda)
+# ────────────────────────────────────────────────
+def run_case(case):
+    marks = {}
+    received = [0]
+
+    def on_state(job):
+        marks.setdefault(job.state, time.perf_counter())
+
+    engine = DownloadEngine(archive=set(), on_state=on_state, make_logger=lambda job: QuietLogger(),
+                            tracer=StageTracer(path=None), store=ContentStore(root=None))
+    # Har bir holat extract'ni qaytadan bajaradi va qayta yuklaydi: foydalanuvchining keshi
+    # va omboriga tegmaymiz
+    engine.info_cache = MetadataCache(cache_dir=os.path.join(case["out"], ".cache"))
+
+    # Extract tugab, birinchi stream so'ralishidan oldin (before_dl)
+    before_download = engine._before_download
+
+    def mark_before_download(job, info):
+        if "before_dl" not in marks:
+            marks["before_dl"] = time.perf_counter()
+            marks["cpu_before_dl"] = os.times()
+        return before_download(job, info)
+
+    # Har bir javob bloki BandwidthScheduler.consume() dan o'tadi: media baytlari shu yerda sanaladi
+    consume = engine.bandwidth.consume
+
+    def counting_consume(channel, n):
+        if n and "before_dl" in marks:
+            now = time.perf_counter()
+            marks.setdefault("first_byte", now)
+            marks["last_byte"] = now
+            received[0] += n
+        consume(channel, n)
+
+    engine._before_download = mark_before_download
+    engine.bandwidth.consume = counting_consume
+
+    start = time.perf_counter()
+    job = engine.submit(case["url"], case["mode"], case["out"], case["quality"])
+    engine.wait()
+    end = time.perf_counter()
+    cpu_after = os.times()
+    if job.state != "done":
+        raise SystemExit(f"yuklash muvaffaqiyatsiz: {job.error}")
+
+    # os.times(): ffmpeg (merge, mp3) bolalar jarayoni sifatida hisoblanadi.
+    # CPU extract'dan keyin o'lchanadi: yuklash + kodlash + merge
+    cpu = sum(cpu_after[:4]) - sum(marks["cpu_before_dl"][:4])
+    mib = received[0] / (1024 * 1024)
+    dl_time = marks["last_byte"] - marks["first_byte"]
+    result = {
+        "downloaded_mib":   round(mib, 2),
+        "output_mib":       round(output_size(case["out"]) / (1024 * 1024), 2),
+        "throughput_mib_s": round(mib / dl_time, 2) if dl_time > 0 else None,
+        "ttfb_ms":          round((marks["first_byte"] - marks["before_dl"]) * 1000, 1),
+        "extract_ms":       round((marks["before_dl"] - start) * 1000, 1),
+        "postprocess_ms":   round((end - marks["post-processing"]) * 1000, 1) if "post-processing" in marks else 0.0,
+        "total_ms":         round((end - start) * 1000, 1),
+        "cpu_s_per_mib":    round(cpu / mib, 4) if mib else None,
+        "peak_rss_mib":     None,
+        "ffmpeg_rss_mib":   None,
+    }
+    try:
+        import resource
+    except ImportError:
+        pass   # Windows: RSS o'lchanmaydi
+    else:
+        # ru_maxrss Linux'da KiB, macOS'da bayt
+        unit = 1 if sys.platform == "darwin" else 1024
+        result["peak_rss_mib"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 2 ** 20, 1)
+        result["ffmpeg_rss_mib"] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 2 ** 20, 1)
+    return result
+
+
+def output_size(folder):
+    return sum(entry.stat().st_size for entry in os.scandir(folder) if entry.is_file())
+
+
+# ────────────────────────────────────────────────
+# Boshqaruvchi jarayon
+# ────────────────────────────────────────────────
+def spawn_case(url, mode, quality):
+    with tempfile.TemporaryDirectory() as out:
+        case = {"url": url, "mode": mode, "quality": quality, "out": out}
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-case", json.dumps(case)],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise SystemExit(f"{mode} {quality or ''}: {proc.stderr.strip() or proc.stdout.strip()}")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def median_of(runs):
+    merged = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs if run[key] is not None]
+        merged[key] = round(statistics.median(values), 4) if values else None
+    return merged
+
+
+def compare(results, baseline, args, tolerance):
+    regressions = []
+    print(f"\nBaseline bilan taqqoslash ({baseline['meta'].get('created')}), chegara {tolerance}%:")
+    changed = {k: v for k, v in baseline["meta"].get("args", {}).items()
+               if k not in ("cases", "repeat", "tolerance") and args.get(k) != v}
+    if changed:
+        print(f"  Diqqat: baseline boshqa sozlamalar bilan olingan: {changed}")
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if not old:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            new_value, old_value = result["median"].get(metric), old["median"].get(metric)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) * 100 / old_value
+            worse = -change if higher_is_better else change
+            mark = "  ⚠ yomonlashdi" if worse > tolerance else ""
+            if mark:
+                regressions.append((name, metric))
+            print(f"  {name:<12} {metric:<17} {old_value:>10} → {new_value:<10} {change:+6.1f}%{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=int, default=20, help="klip davomiyligi (soniya)")
+    parser.add_argument("--rate-kb", type=int, default=0, help="bitta ulanish tezligi (KiB/s), 0 = cheklovsiz")
+    parser.add_argument("--latency-ms", type=int, default=0, help="har bir javobdan oldingi kechikish")
+    parser.add_argument("--no-ranges", action="store_true", help="server Range so'rovlarini qo'llamaydi")
+    parser.add_argument("--repeat", type=int, default=3, help="har bir holat necha marta (mediana olinadi)")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--media-dir", default=os.path.join(tempfile.gettempdir(), "ytd-bench-media"))
+    parser.add_argument("--json", help="natijani shu faylga yozish")
+    parser.add_argument("--baseline", help="oldingi --json natijasi bilan taqqoslash")
+    parser.add_argument("--tolerance", type=float, default=15.0, help="yomonlashish chegarasi (%%)")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return 0
+
+    files = make_media(args.media_dir, args.duration)
+    results = {}
+    with MediaServer(files, rate=args.rate_kb * 1024 or None, latency=args.latency_ms / 1000,
+                     ranges=not args.no_ranges) as server:
+        for name in args.cases:
+            mode, quality = CASES[name]
+            runs = [spawn_case(server.url("/clip.mpd"), mode, quality) for _ in range(args.repeat)]
+            results[name] = {"median": median_of(runs), "runs": runs}
+            m = results[name]["median"]
+            print(f"{name:<12} {m['downloaded_mib']:>7.1f} MiB  {m['throughput_mib_s'] or 0:>7.1f} MiB/s  "
+                  f"TTFB {m['ttfb_ms']:>6.1f} ms  extract {m['extract_ms']:>6.0f} ms  "
+                  f"PP {m['postprocess_ms']:>6.0f} ms  CPU {m['cpu_s_per_mib'] or 0:.3f} s/MiB  "
+                  f"RSS {m['peak_rss_mib'] or 0:.0f} MiB")
+
+    import yt_dlp.version
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "yt_dlp": yt_dlp.version.__version__,
+            "args": {k: v for k, v in vars(args).items() if k not in ("run_case", "json", "baseline")},
+        },
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), report["meta"]["args"], args.tolerance)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+# bench/bench_writer.py
+# Katta (bir necha GB) faylni bo'laklab yozishni tarmoqsiz taqqoslaydi:
+#   eski   — f.truncate() (sparse fayl), har bo'lak uchun open+seek+write, keyin sha256 uchun
+#            faylni qaytadan o'qish (oldingi SegmentedFD va alohida hash bosqichi)
+#   writer — writer.OutputWriter: posix_fallocate, bitta fd orqali os.pwrite, sha256 esa
+#            mmap ustidagi memoryview'lardan yozish davomida hisoblanadi
+# Har bir rejim alohida jarayonda: peak RSS (ru_maxrss), vaqt, read()/write() orqali o'tgan
+# baytlar (/proc/self/io rchar/wchar), eng katta Dirty (/proc/meminfo), page cache o'sishi
+# va filefrag bo'lsa fayl extent'lari soni.
+#   python bench/bench_writer.py [--size-mb 2048] [--chunk-mb 10] [--connections 8] [--dir /mnt/disk]
+
+import os
+import sys
+import json
+import random
+import time
+import hashlib
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from writer import OutputWriter
+
+READ_BLOCK = 64 * 1024                       # segmented.READ_BLOCK bilan bir xil
+HASH_BLOCK = 1024 * 1024
+SAMPLE_INTERVAL = 0.05                       # /proc/meminfo o'qish oralig'i (soniya)
+MODES = ("eski", "writer")
+
+
+# Tarmoq javobi o'rnida: har read() yangi bytes qaytaradi, xuddi response.read() kabi
+def blocks(source, start, end):
+    pos = start
+    while pos < end:
+        size = min(READ_BLOCK, end - pos)
+        offset = pos % len(source)
+        if offset + size > len(source):
+            size = len(source) - offset
+        yield source[offset:offset + size]
+        pos += size
+
+
+def segments(total, chunk_size):
+    return [(start, min(start + chunk_size, total)) for start in range(0, total, chunk_size)]
+
+
+def write_old(path, source, total, chunk_size, connections):
+    with open(path, 'w+b') as f:
+        f.truncate(total)
+
+    def fetch(segment):
+        start, end = segment
+        with open(path, 'r+b', buffering=0) as f:
+            f.seek(start)
+            for block in blocks(source, start, end):
+                f.write(block)
+
+    with ThreadPoolExecutor(max_workers=connections) as pool:
+        list(pool.map(fetch, segments(total, chunk_size)))
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_new(path, source, total, chunk_size, connections):
+    digest = hashlib.sha256()
+    with OutputWriter(path, total) as writer:
+        writer.add_consumer(digest.update)
+
+        def fetch(segment):
+            start, end = segment
+            offset = start
+            for block in blocks(source, start, end):
+                writer.pwrite(offset, block)
+                offset += len(block)
+            writer.mark_done(start, end)
+
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            list(pool.map(fetch, segments(total, chunk_size)))
+        if not writer.complete:
+            raise SystemExit("writer: fayl to'liq iste'molchilarga berilmadi")
+    return digest.hexdigest()
+
+
+def meminfo():
+    values = {}
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                name, rest = line.split(':', 1)
+                values[name] = int(rest.split()[0]) * 1024
+    except OSError:
+        pass
+    return values
+
+
+def proc_io():
+    values = {}
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                name, value = line.split(':')
+                values[name] = int(value)
+    except OSError:
+        pass
+    return values
+
+
+def extents(path):
+    try:
+        out = subprocess.run(["filefrag", path], capture_output=True, text=True, timeout=60).stdout
+        return int(out.rsplit(':', 1)[1].split()[0])
+    except (OSError, ValueError, IndexError, subprocess.SubprocessError):
+        return None
+
+
+def drop_cache(path):
+    if hasattr(os, 'posix_fadvise'):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+# Bola jarayon: bitta rejim, natija stdout'ga JSON
+def run_mode(args):
+    total = args.size_mb * 1024 * 1024
+    source = random.Random(args.size_mb).randbytes(16 * 1024 * 1024)   # ikkala rejimda bir xil
+    path = os.path.join(args.dir, f"bench-{args.run_mode}.bin")
+    peak = {'dirty': 0}
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(SAMPLE_INTERVAL):
+            peak['dirty'] = max(peak['dirty'], meminfo().get('Dirty', 0))
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    cached_before = meminfo().get('Cached', 0)
+    io_before = proc_io()
+    sampler.start()
+    began = time.perf_counter()
+    try:
+        write = write_old if args.run_mode == "eski" else write_new
+        digest = write(path, source, total, args.chunk_mb * 1024 * 1024, args.connections)
+        elapsed = time.perf_counter() - began
+        stop.set()
+        sampler.join()
+        io_after = proc_io()
+        result = {
+            'mode': args.run_mode,
+            'seconds': elapsed,
+            'sha256': digest,
+            'rss_peak': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            'rchar': io_after.get('rchar', 0) - io_before.get('rchar', 0) if io_after else None,
+            'wchar': io_after.get('wchar', 0) - io_before.get('wchar', 0) if io_after else None,
+            'dirty_peak': peak['dirty'] or None,
+            'cached_growth': meminfo().get('Cached', 0) - cached_before if cached_before else None,
+            'extents': extents(path),
+        }
+    finally:
+        if os.path.exists(path):
+            drop_cache(path)
+            os.remove(path)
+    print(json.dumps(result))
+
+
+def mib(value):
+    return "—" if value is None else f"{value / 1024 / 1024:,.0f}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=2048)
+    parser.add_argument("--chunk-mb", type=int, default=10, help="SEGMENT_CHUNK_SIZE kabi")
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="fayl yoziladigan papka (disk)")
+    parser.add_argument("--run-mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        run_mode(args)
+        return 0
+
+    print(f"{args.size_mb} MiB, {args.chunk_mb} MiB bo'laklar, {args.connections} thread, {args.dir}")
+    results = []
+    for mode in MODES:
+        out = subprocess.run([sys.executable, __file__, "--run-mode", mode, "--size-mb", str(args.size_mb),
+                              "--chunk-mb", str(args.chunk_mb), "--connections", str(args.connections),
+                              "--dir", args.dir], capture_output=True, text=True)
+        if out.returncode != 0:
+            print(out.stderr, file=sys.stderr)
+            return 1
+        results.append(json.loads(out.stdout))
+
+    print(f"{'rejim':<8} {'vaqt':>8} {'MiB/s':>8} {'RSS MiB':>8} {'read MiB':>9} {'write MiB':>10} "
+          f"{'Dirty MiB':>10} {'cache +MiB':>11} {'extent':>7}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['seconds']:7.2f}s {args.size_mb / r['seconds']:8.0f} "
+              f"{mib(r['rss_peak']):>8} {mib(r['rchar']):>9} {mib(r['wchar']):>10} "
+              f"{mib(r['dirty_peak']):>10} {mib(r['cached_growth']):>11} {r['extents'] or '—':>7}")
+
+    # Ikkala rejim baytma-bayt bir xil fayl yozishi va hash'lashi kerak
+    failed = len({r['sha256'] for r in results}) != 1
+    if failed:
+        print("XATO: sha256 rejimlar orasida farq qiladi")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
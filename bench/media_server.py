@@ -0,0 +1,186 @@
+# bench/media_server.py
+# Benchmark'lar uchun lokal HTTP server: sintetik fayllar, Range qo'llab-quvvatlash
+# va har bir ulanish uchun tezlik cheklovi (YouTube'dagi kabi). certfile berilsa HTTPS.
+#   python bench/media_server.py --size-mb 64 --rate-kb 2048
+
+import os
+import re
+import sys
+import ssl
+import socket
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BLOCK = 64 * 1024
+RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)$')
+
+
+class MediaServer:
+    # files: {"/clip.mp4": (bytes, "video/mp4")}
+    # rate: bitta ulanish uchun bayt/soniya (None = cheklovsiz); latency: javobdan oldingi kechikish (soniya)
+    # connections — qabul qilingan TCP (TLS bo'lsa handshake) ulanishlar soni
+    # forbidden: 403 qaytaradigan yo'llar (muddati o'tgan imzolangan URL kabi)
+    def __init__(self, files, rate=None, latency=0.0, ranges=True, host="127.0.0.1", port=0,
+                 certfile=None, keyfile=None, forbidden=()):
+        self.files = files
+        self.forbidden = set(forbidden)
+        self.rate = rate
+        self.latency = latency
+        self.ranges = ranges
+        self.requests = 0
+        self.range_requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.tls = certfile is not None
+        if self.tls:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            # Handshake accept() da emas, ulanish thread'ida bo'ladi
+            self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True,
+                                                    do_handshake_on_connect=False)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"{'https' if self.tls else 'http'}://{host}:{port}"
+
+    def url(self, path):
+        return self.base_url + path
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                with server._lock:
+                    server.connections += 1
+                # Header va body alohida yoziladi: Nagle + delayed ACK har javobga ~40 ms qo'shmasin
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                if server.tls:
+                    try:
+                        self.request.do_handshake()
+                    except (ssl.SSLError, OSError):
+                        pass   # setup() davom etadi, birinchi o'qishda ulanish yopiladi
+                super().setup()
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (ssl.SSLError, ConnectionResetError):
+                    pass
+
+            def do_HEAD(self):
+                self._serve(body=False)
+
+            def do_GET(self):
+                self._serve(body=True)
+
+            def _serve(self, body):
+                if self.path.split("?", 1)[0] in server.forbidden:
+                    self.send_error(403)
+                    return
+                entry = server.files.get(self.path.split("?", 1)[0])
+                if entry is None:
+                    self.send_error(404)
+                    return
+                data, content_type = entry
+                with server._lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+
+                start, end, status = 0, len(data) - 1, 200
+                match = RANGE_RE.match(self.headers.get("Range", ""))
+                if server.ranges and match and (match.group(1) or match.group(2)):
+                    if match.group(1):
+                        start = int(match.group(1))
+                        end = min(int(match.group(2)), end) if match.group(2) else end
+                    else:
+                        start = max(0, len(data) - int(match.group(2)))
+                    if start > end:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(data)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    status = 206
+                    with server._lock:
+                        server.range_requests += 1
+
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(end - start + 1))
+                if server.ranges:
+                    self.send_header("Accept-Ranges", "bytes")
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                self.end_headers()
+                if body:
+                    self._send_throttled(memoryview(data)[start:end + 1])
+
+            def _send_throttled(self, view):
+                began = time.monotonic()
+                sent = 0
+                try:
+                    while sent < len(view):
+                        chunk = view[sent:sent + BLOCK]
+                        self.wfile.write(chunk)
+                        sent += len(chunk)
+                        if server.rate:
+                            ahead = sent / server.rate - (time.monotonic() - began)
+                            if ahead > 0:
+                                time.sleep(ahead)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        return Handler
+
+
+def synthetic_file(size):
+    # 1 MiB tasodifiy blok takrorlanadi: siqilmaydi va katta hajmda ham tez tayyorlanadi
+    block = os.urandom(1024 * 1024)
+    return (block * (size // len(block) + 1))[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--rate-kb", type=int, default=0, help="bitta ulanish tezligi (KiB/s), 0 = cheklovsiz")
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--no-ranges", action="store_true")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    data = synthetic_file(args.size_mb * 1024 * 1024)
+    server = MediaServer({"/clip.mp4": (data, "video/mp4"), "/clip.m4a": (data, "audio/mp4")},
+                         rate=args.rate_kb * 1024 or None, latency=args.latency_ms / 1000,
+                         ranges=not args.no_ranges, port=args.port)
+    print(f"{server.base_url}/clip.mp4, {server.base_url}/clip.m4a", file=sys.stderr)
+    server.httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1967 @@
+# engine.py
+# YouTube Downloader - GUI'siz yuklash engine'i (main.py va CLI uchun umumiy)
+# GitHub: https://github.com/pmurodxm/yutube-downloader
+#
+# CLI:
+#   python -m engine urls.txt -o ~/Videos -q 720p
+#   cat urls.txt | python -m engine --audio -o ~/Music
+
+import threading
+import argparse
+import os
+import sys
+import copy
+import time
+import itertools
+import queue
+import json
+import uuid
+import re
+import gzip
+import shutil
+import hashlib
+import functools
+import traceback
+from collections import OrderedDict, deque
+from contextlib import contextmanager, suppress
+
+# yt_dlp (va uning extractor registri) og'ir: u funksiyalar ichida, kerak bo'lganda
+# import qilinadi, GUI esa warm_up() ni oyna chizilgandan keyin fonda chaqiradi
+
+# ────────────────────────────────────────────────
+# Sozlamalar
+# ────────────────────────────────────────────────
+INFO_CACHE_TTL = 30 * 60                     # URL'da expire= bo'lmasa stream URL'lari shuncha amal qiladi (soniya)
+STREAM_URL_MARGIN = 5 * 60                   # expire= dan shuncha oldin URL eskirgan hisoblanadi
+METADATA_TTL = 7 * 24 * 60 * 60              # sarlavha, davomiylik, formatlar ro'yxati keshi (soniya)
+METADATA_MEMORY_ITEMS = 64                   # xotiradagi info dict'lar soni
+METADATA_VERSION = 2                         # kesh yozuvi formati; mos kelmagan yozuvlar qayta extract qilinadi
+ARCHIVE_ID_CACHE_ITEMS = 4096                # URL → arxiv ID xotirasi (extractor'lar bo'yicha qidiruv uchun)
+MAX_CONCURRENT_DOWNLOADS = 3                 # bir vaqtda ishlaydigan yuklashlar soni
+PREFETCH_CONCURRENCY = 8                     # havolalar ro'yxatidan bir vaqtda olinadigan metadata'lar
+POSTPROCESS_WORKERS = os.cpu_count() or 2    # bir vaqtda ishlaydigan merge/mp3 kodlashlar soni
+HTTP_POOL_HOSTS = 16                         # nechta host uchun keep-alive ulanishlar saqlanadi
+HTTP_POOL_PER_HOST = 8                       # bitta hostga bir vaqtdagi ulanishlar (thumbnail, update)
+# YoutubeDL sozlamalaridan RequestDirector (va uning handler'lari) ga ta'sir qiladiganlari
+HTTP_POOL_PARAMS = ('http_headers', 'proxy', 'socket_timeout', 'nocheckcertificate', 'source_address',
+                    'legacyserverconnect', 'enable_file_urls', 'impersonate', 'client_certificate',
+                    'client_certificate_key', 'client_certificate_password', 'debug_printtraffic', 'compat_opts')
+BANDWIDTH_BURST = 0.25                       # token bucket sig'imi (limit bo'yicha necha soniyalik)
+THROTTLE_BLOCK = 64 * 1024                   # limit bo'lganda bitta read() hajmi (bayt)
+LOG_SEGMENT_BYTES = 1024 * 1024              # log fayli shundan oshsa gzip segmentga aylanadi
+LOG_KEEP_SEGMENTS = 64                       # bitta log oqimi uchun saqlanadigan gzip segmentlar
+LOG_KEEP_SESSIONS = 10                       # diskda saqlanadigan oxirgi sessiyalar loglari
+LOG_OPEN_STREAMS = 16                        # bir vaqtda ochiq turadigan log fayllari (qolganlari kerak bo'lganda ochiladi)
+SPANS_MAX_BYTES = 8 * 1024 * 1024            # spans.jsonl shundan oshsa spans.jsonl.1 ga ko'chiriladi
+STATS_SAMPLES = 1000                         # p50/p95 uchun har bir bosqichning oxirgi o'lchovlari
+
+# Transfer tezligi gistogrammasi chegaralari (MiB/s)
+THROUGHPUT_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100)
+# yt-dlp postprocessor kaliti → bosqich nomi (Fixup* → "fixup", qolganlari hisobga olinmaydi)
+PP_STAGES = {'Merger': 'merge', 'ExtractAudio': 'transcode', 'StreamedAudio': 'transcode', 'MoveFiles': 'move'}
+
+# Job ustuvorligi → tarmoq ulushidagi og'irligi. GUI'da tanlangan job "high" oladi,
+# playlist job'lari "low" bo'ladi
+PRIORITY_WEIGHTS = {"high": 4, "normal": 2, "low": 1}
+SEGMENT_CONNECTIONS = 4                      # progressive format uchun parallel ulanishlar (1 = o'chiq)
+SEGMENT_CHUNK_SIZE = 8 * 1024 * 1024         # bitta Range so'rovi hajmi (bayt)
+AUDIO_CODEC = 'mp3'                          # audio rejimidagi natija formati
+AUDIO_QUALITY = '192'                        # kbit/s
+DISK_FREE_RESERVE = 256 * 1024 * 1024        # yuklashlar diskda doim bo'sh qoldiradigan joy (bayt)
+DISK_SIZE_MARGIN = 0.05                      # hajm taxminiga qo'shiladigan zaxira (konteyner, metadata)
+DISK_POLL_INTERVAL = 5.0                     # joy kutayotgan job bo'sh joyni qayta tekshirish oralig'i (soniya)
+FICLONE = 0x40049409                         # Linux ioctl: reflink (btrfs, xfs, bcachefs)
+
+# Sifat nomi → maksimal balandlik (None = eng yuqori)
+QUALITY_HEIGHTS = {"360p": 360, "480p": 480, "720p": 720, "1080p": 1080, "Eng yuqori sifat": None}
+BEST_QUALITY = "Eng yuqori sifat"
+
+# Exe rejimida BASE_PATH ni to'g'ri topish
+if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
+    BASE_PATH = sys._MEIPASS
+else:
+    BASE_PATH = os.path.abspath(os.path.dirname(__file__))
+
+# ffmpeg yo'li (PyInstaller bilan qo'shilgan bo'lsa)
+FFMPEG_PATH = os.path.join(BASE_PATH, "bin", "ffmpeg.exe")
+if os.path.exists(FFMPEG_PATH):
+    os.environ["FFMPEG_LOCATION"] = FFMPEG_PATH
+
+# Kesh va boshqa ish fayllari uchun papka
+APP_DATA_DIR = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser(os.path.join("~", ".cache")),
+                            "YouTubeDownloader")
+ARCHIVE_PATH = os.path.join(APP_DATA_DIR, "archive.txt")
+JOURNAL_PATH = os.path.join(APP_DATA_DIR, "jobs.jsonl")
+METADATA_DIR = os.path.join(APP_DATA_DIR, "metadata")
+LOG_DIR = os.path.join(APP_DATA_DIR, "logs")
+SPANS_PATH = os.path.join(APP_DATA_DIR, "spans.jsonl")
+STORE_DIR = os.path.join(APP_DATA_DIR, "store")
+FINISHED_STATES = ("done", "failed", "skipped")
+
+
+# format_id berilsa (davom ettirilayotgan job), avval aynan o'sha formatlar so'raladi,
+# shunda mavjud .part fayllar Range so'rovlari bilan davom ettiriladi (continuedl)
+def build_ydl_opts(mode, out_folder, quality=None, format_id=None):
+    if mode == "video":
+        max_h = quality_height(quality)
+        fmt = f'bestvideo[height<={max_h}][ext=mp4]+bestaudio[ext=m4a]/best' if max_h else 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best'
+        return {
+            'format': f'{format_id}/{fmt}' if format_id else fmt,
+            'outtmpl': os.path.join(out_folder, '%(title)s.%(ext)s'),
+            'merge_output_format': 'mp4',
+            'noplaylist': True,
+            'continuedl': True,
+        }
+    return {
+        'format': f'{format_id}/bestaudio/best' if format_id else 'bestaudio/best',
+        'outtmpl': os.path.join(out_folder, '%(title)s.%(ext)s'),
+        'continuedl': True,
+        'postprocessors': [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': AUDIO_CODEC,
+            'preferredquality': AUDIO_QUALITY,
+        }],
+    }
+
+
+# "720p" yoki format tanlash oynasidan kelgan "1440p" → 720 / 1440; "Eng yuqori sifat" → None
+def quality_height(quality):
+    if quality in QUALITY_HEIGHTS:
+        return QUALITY_HEIGHTS[quality]
+    match = re.fullmatch(r'(\d+)p', quality or '')
+    return int(match.group(1)) if match else None
+
+
+# vcodec'ning birinchi qismi → ko'rsatiladigan nom
+VIDEO_CODECS = {'avc1': 'H.264', 'avc3': 'H.264', 'h264': 'H.264', 'vp09': 'VP9', 'vp9': 'VP9',
+                'vp8': 'VP8', 'av01': 'AV1', 'hev1': 'H.265', 'hvc1': 'H.265'}
+
+
+def format_size(fmt, duration=None):
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if not size and fmt.get('tbr') and duration:
+        size = int(fmt['tbr'] * 1000 / 8 * duration)
+    return size or None
+
+
+# "137+140" kabi aniq format_id uchun taxminiy hajm (bayt) yoki None
+def estimate_size(info, format_id):
+    by_id = {f.get('format_id'): f for f in info.get('formats') or []}
+    sizes = [format_size(by_id[part], info.get('duration')) if part in by_id else None
+             for part in (format_id or '').split('+')]
+    return sum(sizes) if sizes and None not in sizes else None
+
+
+# Format tanlash oynasi uchun: har bir (balandlik, fps, kodek) bo'yicha eng yaxshi video
+# va unga qo'shiladigan eng yaxshi audio (mp4'ga merge uchun m4a afzal), taxminiy hajm bilan.
+# Natijadagi format_id yt-dlp'ga to'g'ridan-to'g'ri beriladi — format qayta tanlanmaydi.
+def video_format_choices(info):
+    formats = info.get('formats') or []
+    audios = [f for f in formats if f.get('vcodec') == 'none' and f.get('acodec') not in (None, 'none')]
+    audio = max(audios, key=lambda f: (f.get('ext') == 'm4a', f.get('abr') or f.get('tbr') or 0), default=None)
+
+    best = {}
+    for f in formats:
+        if f.get('vcodec') in (None, 'none') or not f.get('height'):
+            continue
+        codec = f['vcodec'].split('.')[0].lower()
+        key = (f['height'], round(f.get('fps') or 0), VIDEO_CODECS.get(codec, codec))
+        if key not in best or (f.get('tbr') or 0) > (best[key].get('tbr') or 0):
+            best[key] = f
+
+    choices = []
+    for (height, fps, codec), f in best.items():
+        progressive = f.get('acodec') not in (None, 'none')
+        format_id = f['format_id'] if progressive or audio is None else f"{f['format_id']}+{audio['format_id']}"
+        choices.append({
+            'format_id': format_id,
+            'quality': f"{height}p",
+            'label': f"{height}p{fps if fps > 30 else ''}",
+            'height': height,
+            'fps': fps or None,
+            'codec': codec,
+            'ext': f.get('ext'),
+            'size': estimate_size(info, format_id),
+        })
+    # Bir xil balandlikda H.264 (mp4'ga qayta kodlashsiz tushadi) birinchi turadi
+    choices.sort(key=lambda c: (-c['height'], -(c['fps'] or 0), c['codec'] != 'H.264', c['codec']))
+    return choices
+
+
+# Imzolangan stream URL'lari qachongacha amal qilishi: YouTube URL'larida expire=<unix vaqt>
+EXPIRE_RE = re.compile(r'[?&/]expire[=/](\d+)')
+
+
+def stream_expiry(info, fetched_at):
+    formats = info.get('requested_formats') or info.get('formats') or []
+    urls = [info.get('url')] + [f.get('url') for f in formats]
+    stamps = [int(m.group(1)) for m in (EXPIRE_RE.search(u) for u in urls if u) if m]
+    if stamps:
+        return min(stamps) - STREAM_URL_MARGIN
+    return fetched_at + INFO_CACHE_TTL
+
+
+# Ikki qavatli metadata keshi: xotirada LRU, diskda gzip'langan JSON. Kalit — kanonik
+# video ID (archive_id_for_url), shuning uchun youtu.be/x va watch?v=x bitta yozuv.
+# Sarlavha, davomiylik, thumbnail va formatlar ro'yxati METADATA_TTL davomida ishlatiladi
+# (get_metadata); imzolangan stream URL'lari esa o'z muddati bilan alohida kuzatiladi (get).
+class MetadataCache:
+    def __init__(self, cache_dir=METADATA_DIR, max_items=METADATA_MEMORY_ITEMS, ttl=METADATA_TTL):
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self.ttl = ttl
+        self._memory = OrderedDict()    # kalit → {'fetched', 'streams_expire', 'info'}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url):
+        return archive_id_for_url(url) or url
+
+    def put(self, url, info):
+        now = time.time()
+        entry = {'version': METADATA_VERSION, 'fetched': now, 'streams_expire': stream_expiry(info, now), 'info': info}
+        key = self.key(url)
+        self._remember(key, entry)
+        self._write(key, entry)
+
+    # Yuklash uchun: stream URL'lari hali amal qilsagina
+    def get(self, url):
+        entry = self._entry(url)
+        if entry is None or time.time() >= entry['streams_expire']:
+            return None
+        # process_ie_result dict'ni o'zgartiradi, shuning uchun nusxa beramiz
+        return copy.deepcopy(entry['info'])
+
+    # Ko'rsatish va format tanlash uchun: URL'lar eskirgan bo'lsa ham
+    def get_metadata(self, url):
+        entry = self._entry(url)
+        return copy.deepcopy(entry['info']) if entry is not None else None
+
+    # Faqat xotiradan, nusxasiz (UI thread'i uchun; natijani o'zgartirmang)
+    def peek(self, url):
+        with self._lock:
+            entry = self._memory.get(self.key(url))
+        return entry['info'] if entry is not None else None
+
+    # Server URL'ni rad etdi (403): metadata qoladi, keyingi yuklash qayta extract qiladi
+    def expire_streams(self, url):
+        entry = self._entry(url)
+        if entry is not None and entry['streams_expire']:
+            entry['streams_expire'] = 0
+            self._write(self.key(url), entry)
+
+    def _entry(self, url):
+        key = self.key(url)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is None:
+            entry = self._read(key)
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is not None and time.time() - entry['fetched'] > self.ttl:
+            return None
+        return entry
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + ".json.gz")
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError):
+            return None   # yarim yozilgan yoki buzilgan fayl — qayta extract qilinadi
+        if entry.get('version') != METADATA_VERSION or time.time() - entry.get('fetched', 0) > self.ttl:
+            with suppress(OSError):   # boshqa thread/jarayon allaqachon o'chirgan bo'lishi mumkin
+                os.remove(path)
+            return None
+        return entry
+
+    # JSON'ga sig'maydigan qiymatlar (fragment generatorlari, funksiyalar) satrga aylansa, diskdan
+    # qaytgan info yuklashni buzadi. Bunday info faqat xotirada qoladi, diskdagi eski yozuv
+    # o'chiriladi: boshqa jarayon uni qayta extract qiladi
+    def _write(self, key, entry):
+        path = self._path(key)
+        try:
+            text = json.dumps(entry, ensure_ascii=False, default=_json_default)
+        except (TypeError, ValueError):
+            with suppress(OSError):
+                os.remove(path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+# Metadata keshi uchun json.dumps(default=...): ro'yxat/satrga aniq aylanadigan turlar;
+# qolganlari (fragment generatorlari, funksiyalar) TypeError — bunday info diskka yozilmaydi
+def _json_default(obj):
+    from yt_dlp.networking.impersonate import ImpersonateTarget
+    from yt_dlp.utils import LazyList
+    if isinstance(obj, (set, LazyList)):
+        return list(obj)
+    if isinstance(obj, ImpersonateTarget):
+        return str(obj)
+    raise TypeError(f"{type(obj).__name__} JSON'ga sig'maydi")
+
+
+def is_forbidden_error(err):
+    # Muddati o'tgan imzolangan URL odatda HTTP 403 qaytaradi
+    exc_info = getattr(err, 'exc_info', None)
+    cause = exc_info[1] if exc_info else err
+    return getattr(cause, 'status', None) == 403 or 'HTTP Error 403' in str(err)
+
+
+# Hook faqat har bir job'ning oxirgi baytlar holatini saqlaydi,
+# iste'molchi (GUI) esa uni o'z tezligida oladi
+class ProgressAggregator:
+    def __init__(self):
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    def update(self, job, downloaded, total):
+        with self._lock:
+            self._latest[job] = (downloaded, total)
+
+    def drain(self):
+        with self._lock:
+            latest, self._latest = self._latest, {}
+        return latest
+
+
+# Job bosqichlari uchun strukturali o'lchovlar (span'lar): extract → format-select → transfer
+# → merge/transcode → move, shuningdek job'siz extract (preview) va thumbnail. Har bir span
+# spans.jsonl ga bitta JSON qator bo'lib yoziladi; xotirada esa bosqich bo'yicha oxirgi
+# STATS_SAMPLES davomiylik (p50/p95 uchun) va transfer tezligi gistogrammasi saqlanadi.
+# prometheus() shu ma'lumotni Prometheus matn formatida beradi, serve() uni /metrics'da ochadi.
+class StageTracer:
+    def __init__(self, path=SPANS_PATH, samples=STATS_SAMPLES):
+        self.path = path
+        self.samples = samples
+        self._open = {}        # (job key, bosqich) → (perf_counter, time.time())
+        self._stages = {}      # bosqich → {'durations', 'count', 'sum', 'bytes', 'errors'}
+        self._throughput = [0] * (len(THROUGHPUT_BUCKETS) + 1)
+        self._throughput_sum = 0.0   # gistogrammaning _sum qatori uchun (MiB/s yig'indisi)
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+
+    def begin(self, job, stage):
+        with self._lock:
+            self._open[(self._key(job), stage)] = (time.perf_counter(), time.time())
+
+    def end(self, job, stage, size=None, error=None):
+        with self._lock:
+            started = self._open.pop((self._key(job), stage), None)
+        if started is not None:
+            self._record(job, stage, started, size, error)
+
+    # Job tugadi: ochiq qolgan bosqichlari yopiladi (error berilsa muvaffaqiyatsiz deb)
+    def end_all(self, job, error=None):
+        key = self._key(job)
+        with self._lock:
+            stages = [stage for k, stage in self._open if k == key]
+        for stage in stages:
+            self.end(job, stage, error=error)
+
+    # Job'siz ishlar uchun: with tracer.span(None, "thumbnail") as span: ...; span['bytes'] = n
+    @contextmanager
+    def span(self, job, stage):
+        started = (time.perf_counter(), time.time())
+        fields = {'bytes': None}
+        try:
+            yield fields
+        except Exception as e:
+            self._record(job, stage, started, fields['bytes'], str(e))
+            raise
+        self._record(job, stage, started, fields['bytes'], None)
+
+    # bosqich → {'count', 'errors', 'bytes', 'p50', 'p95'} (soniya)
+    def stats(self):
+        with self._lock:
+            stages = {name: (sorted(s['durations']), s['count'], s['errors'], s['bytes'])
+                      for name, s in self._stages.items()}
+        return {name: {'count': count, 'errors': errors, 'bytes': size,
+                       'p50': percentile(durations, 50), 'p95': percentile(durations, 95)}
+                for name, (durations, count, errors, size) in stages.items()}
+
+    # [(yuqori chegara MiB/s yoki None = cheksiz, transfer'lar soni), ...]
+    def throughput_histogram(self):
+        with self._lock:
+            counts = list(self._throughput)
+        return list(zip(THROUGHPUT_BUCKETS + (None,), counts))
+
+    def prometheus(self):
+        with self._lock:
+            stages = {name: dict(s, durations=sorted(s['durations'])) for name, s in self._stages.items()}
+            counts = list(self._throughput)
+            throughput_sum = self._throughput_sum
+        lines = ["# TYPE ytd_stage_duration_seconds summary"]
+        for name, s in sorted(stages.items()):
+            for q in (50, 95):
+                lines.append(f'ytd_stage_duration_seconds{{stage="{name}",quantile="0.{q}"}} '
+                             f'{percentile(s["durations"], q) or 0:.6f}')
+            lines.append(f'ytd_stage_duration_seconds_sum{{stage="{name}"}} {s["sum"]:.6f}')
+            lines.append(f'ytd_stage_duration_seconds_count{{stage="{name}"}} {s["count"]}')
+        lines.append("# TYPE ytd_stage_bytes_total counter")
+        lines.extend(f'ytd_stage_bytes_total{{stage="{name}"}} {s["bytes"]}' for name, s in sorted(stages.items()))
+        lines.append("# TYPE ytd_stage_errors_total counter")
+        lines.extend(f'ytd_stage_errors_total{{stage="{name}"}} {s["errors"]}' for name, s in sorted(stages.items()))
+        lines.append("# TYPE ytd_transfer_throughput_mib_s histogram")
+        cumulative = 0
+        for bound, count in zip(THROUGHPUT_BUCKETS + ("+Inf",), counts):
+            cumulative += count
+            lines.append(f'ytd_transfer_throughput_mib_s_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"ytd_transfer_throughput_mib_s_sum {throughput_sum:.6f}")
+        lines.append(f"ytd_transfer_throughput_mib_s_count {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    # Prometheus uchun 127.0.0.1:port/metrics (fon thread'ida); server'ni qaytaradi
+    def serve(self, port, host="127.0.0.1"):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    @staticmethod
+    def _key(job):
+        return job.key if job is not None else None
+
+    def _record(self, job, stage, started, size, error):
+        duration = time.perf_counter() - started[0]
+        with self._lock:
+            s = self._stages.get(stage)
+            if s is None:
+                s = self._stages[stage] = {'durations': deque(maxlen=self.samples), 'count': 0,
+                                           'sum': 0.0, 'bytes': 0, 'errors': 0}
+            s['durations'].append(duration)
+            s['count'] += 1
+            s['sum'] += duration
+            s['bytes'] += size or 0
+            s['errors'] += error is not None
+            if stage == "transfer" and size and duration > 0 and error is None:
+                rate = size / duration / (1024 * 1024)
+                self._throughput[sum(1 for bound in THROUGHPUT_BUCKETS if rate > bound)] += 1
+                self._throughput_sum += rate
+        if self.path is None:
+            return
+        span = {'stage': stage, 'start': round(started[1], 3), 'duration': round(duration, 4),
+                'bytes': size, 'ok': error is None}
+        if job is not None:
+            span.update(job=job.id, key=job.key, mode=job.mode)
+        if error is not None:
+            span['error'] = error
+        line = json.dumps(span, ensure_ascii=False)
+        with self._file_lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            try:
+                if os.path.getsize(self.path) > SPANS_MAX_BYTES:
+                    os.replace(self.path, self.path + ".1")
+            except FileNotFoundError:
+                pass
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+
+
+# Tartiblangan ro'yxatdan nearest-rank percentil (bo'sh bo'lsa None)
+def percentile(values, q):
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, -(-len(values) * q // 100) - 1))]
+
+
+# Ilova bo'ylab umumiy HTTP ulanishlar puli. Thumbnail va update so'rovlari uchun bitta
+# requests.Session, yt-dlp (metadata va yuklash) uchun esa RequestDirector (tarmoq sozlamalari
+# bo'yicha bittadan) va bitta cookie jar saqlanadi: bir xil hostga keyingi so'rovlar keep-alive
+# ulanishdan foydalanadi va har safar yangi TCP+TLS handshake qilinmaydi.
+# requests/yt_dlp birinchi so'rovda import qilinadi.
+class HttpPool:
+    def __init__(self, max_hosts=HTTP_POOL_HOSTS, per_host=HTTP_POOL_PER_HOST, verify=True):
+        self.max_hosts = max_hosts
+        self.per_host = per_host
+        self.verify = verify
+        self._session = None
+        self._directors = {}             # tarmoq sozlamalari (HTTP_POOL_PARAMS) → RequestDirector
+        self._cookiejar = None
+        self._local = threading.local()  # shu thread'da so'rov yuborayotgan YoutubeDL
+        self._lock = threading.RLock()   # director qurilayotganda cookiejar() ham chaqiriladi
+
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                session.verify = self.verify
+                adapter = HTTPAdapter(pool_connections=self.max_hosts, pool_maxsize=self.per_host, pool_block=True)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def cookiejar(self):
+        with self._lock:
+            if self._cookiejar is None:
+                from yt_dlp.cookies import YoutubeDLCookieJar
+                self._cookiejar = YoutubeDLCookieJar()
+            return self._cookiejar
+
+    # Tarmoq sozlamalari (header'lar, proxy, timeout, sertifikat tekshiruvi) bir xil bo'lgan
+    # YoutubeDL'lar bitta director'ni ishlatadi; engine barcha job'larga bir xil sozlamalarni beradi.
+    # Director hech qaysi job'ga bog'lanmagan PoolYoutubeDL'da yt-dlp'ning o'z yo'li bilan quriladi
+    def director(self, ydl):
+        params = {name: ydl.params[name] for name in HTTP_POOL_PARAMS if ydl.params.get(name) is not None}
+        key = json.dumps(params, sort_keys=True,
+                         default=lambda v: sorted(v) if isinstance(v, (set, frozenset)) else str(v))
+        with self._lock:
+            director = self._directors.get(key)
+            if director is None:
+                _, segmented = load_downloader()
+                director = self._directors[key] = segmented.PoolYoutubeDL(self, params).request_director()
+            return director
+
+    # with pool.bind(ydl): — shu thread'dagi so'rovlar davomida handler xabarlari ydl'ning logger'iga boradi
+    @contextmanager
+    def bind(self, ydl):
+        previous = getattr(self._local, 'ydl', None)
+        self._local.ydl = ydl
+        try:
+            yield
+        finally:
+            self._local.ydl = previous
+
+    def current(self):
+        return getattr(self._local, 'ydl', None)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+            for director in self._directors.values():
+                director.close()
+            self._directors.clear()
+
+
+# Barcha faol job'lar uchun umumiy token bucket (yt-dlp'ning ratelimit'i faqat bitta
+# YoutubeDL nusxasiga tegishli). Limit bor bo'lsa, navbatdagi o'qishni kutayotganlar
+# ichidan eng kichik "pass" qiymatli kanal oladi (stride scheduling): kanal o'qigan
+# baytlar / og'irlik qadar oldinga siljiydi, shuning uchun tarmoq og'irliklar nisbatida
+# bo'linadi, bo'sh turgan kanalning ulushi esa boshqalarga o'tadi.
+# Limitlar ishlab turgan job'larni to'xtatmasdan o'zgartiriladi (set_limits).
+class BandwidthScheduler:
+    def __init__(self, rate=None, job_rate=None):
+        self.rate = rate            # umumiy limit, bayt/s (None = cheklovsiz)
+        self.job_rate = job_rate    # bitta job limiti, bayt/s
+        self.focus = None           # GUI'da kuzatilayotgan job kaliti
+        self._cond = threading.Condition()
+        self._tokens = 0.0
+        self._stamp = time.monotonic()
+        self._waiting = set()
+
+    def channel(self, key, priority="normal"):
+        return BandwidthChannel(self, key, priority)
+
+    def set_limits(self, rate=None, job_rate=None):
+        with self._cond:
+            self._refill(time.monotonic())
+            self.rate = rate or None
+            self.job_rate = job_rate or None
+            self._tokens = min(self._tokens, 0.0)
+            self._cond.notify_all()
+
+    def set_focus(self, key):
+        with self._cond:
+            self.focus = key
+
+    def consume(self, channel, n):
+        with self._cond:
+            if not n or (self.rate is None and self.job_rate is None):
+                return
+            # Bo'sh turgan kanal to'plangan "kredit" bilan boshqalarni siqib chiqarmasin
+            passes = [c.vpass for c in self._waiting]
+            if passes:
+                channel.vpass = max(channel.vpass, min(passes))
+            self._waiting.add(channel)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    own_wait = channel.ready_at - now if self.job_rate else 0
+                    global_wait = -self._tokens / self.rate if self.rate and self._tokens <= 0 else 0
+                    ready = [c for c in self._waiting if not self.job_rate or c.ready_at <= now]
+                    head = min(ready, key=lambda c: c.vpass, default=None)
+                    if head is channel and own_wait <= 0 and global_wait <= 0:
+                        break
+                    self._cond.wait(min(max(own_wait, global_wait) or BANDWIDTH_BURST, BANDWIDTH_BURST))
+            finally:
+                self._waiting.discard(channel)
+                self._cond.notify_all()
+            # Blok allaqachon o'qilgan: token yetmasa qarz sifatida yoziladi
+            if self.rate:
+                self._tokens -= n
+            if self.job_rate:
+                channel.ready_at = max(channel.ready_at, now) + n / self.job_rate
+            channel.vpass += n / self._weight(channel)
+
+    def _weight(self, channel):
+        weight = PRIORITY_WEIGHTS.get(channel.priority, 1)
+        if channel.key == self.focus:
+            weight = max(weight, PRIORITY_WEIGHTS["high"])
+        return weight
+
+    def _refill(self, now):
+        if self.rate:
+            self._tokens = min(self.rate * BANDWIDTH_BURST, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+
+# Bitta job'ning scheduler'dagi ulushi; wrap() yt-dlp javobining read() metodini o'raydi
+class BandwidthChannel:
+    def __init__(self, scheduler, key, priority="normal"):
+        self.scheduler = scheduler
+        self.key = key
+        self.priority = priority
+        self.vpass = 0.0
+        self.ready_at = 0.0
+
+    def wrap(self, read):
+        scheduler = self.scheduler
+
+        def throttled_read(amt=None):
+            # Limit bo'lsa katta bloklar bo'linadi, aks holda tezlik sakrab turadi
+            if amt is not None and (scheduler.rate or scheduler.job_rate):
+                amt = min(amt, THROTTLE_BLOCK)
+            data = read(amt)
+            scheduler.consume(self, len(data))
+            return data
+
+        return throttled_read
+
+
+# Yuklangan videolar ro'yxati: yt-dlp download_archive formatidagi
+# ("youtube dQw4w9WgXcQ") append-only fayl + xotirada set
+class DownloadArchive:
+    def __init__(self, path=ARCHIVE_PATH):
+        self.path = path
+        self._ids = None
+        self._lock = threading.Lock()
+
+    # Katta arxiv faylini startup'da emas, birinchi murojaatda o'qiymiz
+    def load(self):
+        if self._ids is None:
+            with self._lock:
+                if self._ids is None:
+                    self._ids = set(self._read(self.path))
+        return self._ids
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        yield line
+        except FileNotFoundError:
+            return
+
+    def __contains__(self, archive_id):
+        return archive_id in self.load()
+
+    def __len__(self):
+        return len(self.load())
+
+    def add(self, archive_id):
+        self.load()
+        with self._lock:
+            if archive_id in self._ids:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(archive_id + "\n")
+            self._ids.add(archive_id)
+
+    def import_file(self, path):
+        self.load()
+        with self._lock:
+            new_ids = [i for i in dict.fromkeys(self._read(path)) if i not in self._ids]
+            if new_ids:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write("".join(i + "\n" for i in new_ids))
+                self._ids.update(new_ids)
+        return len(new_ids)
+
+    def export_file(self, path):
+        self.load()
+        with self._lock:
+            ids = sorted(self._ids)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("".join(i + "\n" for i in ids))
+        return len(ids)
+
+
+# Oddiy YouTube video havolalari (watch?v=, youtu.be/, shorts/, embed/, live/) uchun
+# extractor'larni yuklamasdan ID topiladi; list= bo'lsa havola playlist sifatida ochiladi
+YOUTUBE_VIDEO_RE = re.compile(
+    r'^(?:https?://)?(?:(?:www|m|music)\.)?'
+    r'(?:youtube(?:-nocookie)?\.com/(?:watch\?(?:[^#]*&)?v=|shorts/|embed/|live/|v/)|youtu\.be/)'
+    r'([0-9A-Za-z_-]{11})(?![0-9A-Za-z_-])')
+
+
+# Tarmoqqa chiqmasdan, extractor'ning _VALID_URL'i bo'yicha arxiv ID'sini topadi.
+# Extractor'lar bo'yicha qidiruv qimmat — oxirgi ARCHIVE_ID_CACHE_ITEMS ta natija eslab qolinadi
+@functools.lru_cache(maxsize=ARCHIVE_ID_CACHE_ITEMS)
+def archive_id_for_url(url):
+    match = YOUTUBE_VIDEO_RE.match(url)
+    if match and 'list=' not in url:
+        return make_archive_id('Youtube', match.group(1))
+    from yt_dlp.extractor import gen_extractor_classes
+    archive_id = None
+    for ie in gen_extractor_classes():
+        if ie.ie_key() == 'Generic' or not ie.suitable(url):
+            continue
+        temp_id = ie.get_temp_id(url)
+        if temp_id is not None:
+            archive_id = make_archive_id(ie.ie_key(), temp_id)
+        break
+    return archive_id
+
+
+# yt_dlp.utils.make_archive_id bilan bir xil format
+def make_archive_id(ie_key, video_id):
+    return f'{ie_key.lower()} {video_id}'
+
+
+def archive_id_for_info(info):
+    ie_key = info.get('extractor_key') or info.get('ie_key')
+    if ie_key and info.get('id'):
+        return make_archive_id(ie_key, info['id'])
+    return None
+
+
+# Playlist/kanal entry'larini yt-dlp'ning lazy generatoridan topilishi bilan beradi.
+# Butun ro'yxat xotirada saqlanmaydi; ydl shu obyektga tegishli bo'ladi.
+class PlaylistSource:
+    def __init__(self, ydl, info):
+        self.ydl = ydl
+        self.info = info
+        self.title = info.get('title') or info.get('id') or "Playlist"
+
+    def __iter__(self):
+        try:
+            yield from self._walk(self.info)
+        finally:
+            self.ydl.close()
+
+    def _walk(self, info):
+        for entry in info.get('entries') or ():
+            if not entry:
+                continue
+            url = entry.get('url') or entry.get('webpage_url')
+            if not url:
+                continue
+            # Kanal bosh sahifasi tab'larga (Videos, Shorts, ...) bo'linadi
+            if entry.get('_type') == 'playlist' or entry.get('ie_key') == 'YoutubeTab':
+                yield from self._walk(self.ydl.extract_info(url, download=False, process=False))
+            else:
+                yield url, entry.get('title') or url, archive_id_for_info(entry)
+
+
+# Job'lar jurnali: append-only JSON lines, har bir qator {"key": ..., <o'zgargan maydonlar>}.
+# Ishga tushishda qatorlar key bo'yicha birlashtiriladi va fayl faqat tugallanmaganlar bilan qayta yoziladi.
+class JobJournal:
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, job, **fields):
+        line = json.dumps({'key': job.key, **fields}, ensure_ascii=False)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+
+    def pending(self):
+        entries = {}
+        with self._lock:
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue  # oxirgi qator yarim yozilgan bo'lishi mumkin
+                        entries.setdefault(entry['key'], {}).update(entry)
+            except FileNotFoundError:
+                return []
+
+            unfinished = [e for e in entries.values()
+                          if e.get('url') and e.get('state') not in FINISHED_STATES]
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in unfinished))
+            os.replace(tmp_path, self.path)
+        return unfinished
+
+
+# Sessiya loglari: LOG_DIR/<sessiya>/ ichida "all" (hamma xabarlar) va har bir job uchun
+# alohida oqim. Har qator "teg\tmatn" ko'rinishida yoziladi; joriy fayl LOG_SEGMENT_BYTES dan
+# oshsa gzip segmentga aylanadi. Qatorlar oqim boshidan raqamlanadi, shuning uchun GUI
+# faqat oxirgi oynani ko'rsatib, eskisini kerak bo'lganda diskdan o'qiy oladi.
+# Job'lar ko'p bo'lsa ham faqat oxirgi yozilgan open_streams ta fayl ochiq turadi.
+class LogStore:
+    def __init__(self, root=LOG_DIR, segment_bytes=LOG_SEGMENT_BYTES, keep_segments=LOG_KEEP_SEGMENTS,
+                 keep_sessions=LOG_KEEP_SESSIONS, open_streams=LOG_OPEN_STREAMS):
+        self.segment_bytes = segment_bytes
+        self.keep_segments = keep_segments
+        self.open_streams = open_streams
+        self.dir = os.path.join(root, time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}")
+        self._streams = {}
+        self._open = OrderedDict()       # ochiq fayli bor oqimlar (LRU): nom → holat
+        self._unpacked = OrderedDict()   # gzip segment yo'li → qatorlar (oxirgi ikkitasi)
+        self._lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+        self._prune_sessions(root, keep_sessions)
+
+    # Matn "all" oqimiga va job berilsa uning oqimiga yoziladi.
+    # Natija: oqim → birinchi yozilgan qator raqami
+    def write(self, text, tag=None, job=None):
+        lines = text.rstrip("\n").replace("\r", "").split("\n")
+        data = "".join(f"{tag or ''}\t{line}\n" for line in lines).encode('utf-8', 'replace')
+        streams = ("all",) if job is None else ("all", str(job))
+        with self._lock:
+            return {name: self._append(self._stream(name), data, len(lines)) for name in streams}
+
+    def line_count(self, stream="all"):
+        with self._lock:
+            state = self._streams.get(str(stream))
+            return state['count'] if state else 0
+
+    # Diskda hali bor eng eski qator raqami (eski segmentlar o'chirilgan bo'lishi mumkin)
+    def first_line(self, stream="all"):
+        with self._lock:
+            state = self._streams.get(str(stream))
+            if not state:
+                return 0
+            return state['segments'][0][1] if state['segments'] else state['first']
+
+    # [start, end) oralig'idagi qatorlar: [(teg, matn), ...]
+    def read(self, stream, start, end):
+        with self._lock:
+            state = self._streams.get(str(stream))
+            if not state:
+                return []
+            rows = []
+            for path, first, count in state['segments']:
+                if first + count > start and first < end:
+                    lines = self._unpack(path)
+                    rows.extend(lines[max(0, start - first):end - first])
+            if end > state['first'] and state['offsets']:
+                offsets = state['offsets']
+                lo = max(0, start - state['first'])
+                hi = end - state['first']
+                if lo < len(offsets):
+                    with open(state['path'], 'rb') as f:
+                        f.seek(offsets[lo])
+                        size = (offsets[hi] if hi < len(offsets) else state['size']) - offsets[lo]
+                        rows.extend(f.read(size).decode('utf-8', 'replace').split("\n")[:-1])
+        return [tuple(row.split("\t", 1)) if "\t" in row else ("", row) for row in rows]
+
+    # before'dan oldingi qatorlar orasida oxirgi mos kelganining raqami (katta-kichik harf farqsiz)
+    def search(self, stream, needle, before=None, page=2000):
+        needle = needle.lower()
+        first = self.first_line(stream)
+        end = self.line_count(stream) if before is None else before
+        while end > first:
+            start = max(first, end - page)
+            rows = self.read(stream, start, end)
+            for i in range(len(rows) - 1, -1, -1):
+                if needle in rows[i][1].lower():
+                    return start + i
+            end = start
+        return None
+
+    def close(self):
+        with self._lock:
+            while self._open:
+                self._close_file(self._open.popitem()[1])
+
+    def _stream(self, name):
+        state = self._streams.get(name)
+        if state is None:
+            path = os.path.join(self.dir, f"{name}.log")
+            state = {'name': name, 'path': path, 'file': None, 'first': 0, 'count': 0,
+                     'size': 0, 'offsets': [], 'segments': [], 'rotations': 0}   # segments: [(yo'l, birinchi qator, soni)]
+            self._streams[name] = state
+        return state
+
+    # Oqimning yozish uchun fayli; eng uzoq yozilmagan oqimning fayli yopiladi
+    def _file(self, state):
+        if state['file'] is None:
+            state['file'] = open(state['path'], 'ab', buffering=0)
+        self._open[state['name']] = state
+        self._open.move_to_end(state['name'])
+        while len(self._open) > max(1, self.open_streams):
+            self._close_file(self._open.popitem(last=False)[1])
+        return state['file']
+
+    @staticmethod
+    def _close_file(state):
+        if state['file'] is not None:
+            state['file'].close()
+            state['file'] = None
+
+    def _append(self, state, data, count):
+        start = state['count']
+        # Har bir qatorning joriy fayldagi boshlanishi (o'qishda seek uchun)
+        pos = state['size']
+        for line in data.split(b"\n")[:-1]:
+            state['offsets'].append(pos)
+            pos += len(line) + 1
+        self._file(state).write(data)
+        state['size'] = pos
+        state['count'] += count
+        if state['size'] >= self.segment_bytes:
+            self._rotate(state)
+        return start
+
+    def _rotate(self, state):
+        self._close_file(state)
+        state['rotations'] += 1
+        segment = state['path'][:-len(".log")] + f".{state['rotations']:05d}.log.gz"
+        with open(state['path'], 'rb') as src, gzip.open(segment, 'wb', compresslevel=6) as dst:
+            dst.write(src.read())
+        state['segments'].append((segment, state['first'], state['count'] - state['first']))
+        while len(state['segments']) > self.keep_segments:
+            os.remove(state['segments'].pop(0)[0])
+        state['file'] = open(state['path'], 'wb', buffering=0)
+        state['first'] = state['count']
+        state['size'] = 0
+        state['offsets'] = []
+
+    def _unpack(self, path):
+        lines = self._unpacked.get(path)
+        if lines is None:
+            with gzip.open(path, 'rb') as f:
+                lines = f.read().decode('utf-8', 'replace').split("\n")[:-1]
+            self._unpacked[path] = lines
+            while len(self._unpacked) > 2:
+                self._unpacked.popitem(last=False)
+        self._unpacked.move_to_end(path)
+        return lines
+
+    @staticmethod
+    def _prune_sessions(root, keep):
+        sessions = sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)))
+        for name in sessions[:-keep] if keep else []:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+class DownloadJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, url, mode, out_folder, quality, key=None):
+        self.id = next(self._ids)
+        self.key = key or uuid.uuid4().hex
+        self.url = url
+        self.mode = mode
+        self.out_folder = out_folder
+        self.quality = quality
+        self.state = "queued"
+        self.percent = 0.0
+        self.title = url
+        self.error = None
+        self.archive_id = None
+        self.format_id = None
+        self.priority = "normal"
+        self.expected_size = None   # format tanlanganda taxminiy hajm (bayt)
+        self.stream_sizes = {}   # format_id → kutilgan hajm (video+audio bo'lsa ikkita)
+        self.disk_rate = None    # yuklangan bayt → diskka yozilgan bayt (DiskSpaceGate.progress uchun)
+        self.streams = {}        # format_id → (yuklangan, jami, tugaganmi)
+        self.stream_hashes = {}  # format_id → yuklash davomida hisoblanayotgan sha256
+        self.content_key = None  # ContentStore kaliti (content_key())
+        self.output_path = None  # tayyor fayl (MoveFiles'dan keyin)
+        self.reused = None       # ombordan olingan bo'lsa usul: "reflink"/"hardlink"/"copy"
+        self.force = False       # arxivda bo'lsa ham yuklanadi (foydalanuvchi qayta yuklashni so'ragan)
+
+    # Parallel stream'lar progress'i bayt hajmi bo'yicha qo'shiladi; (yuklangan, jami) qaytaradi
+    def update_stream(self, format_id, downloaded, total, finished=False):
+        self.streams[format_id] = (downloaded, total or self.stream_sizes.get(format_id), finished)
+        streams = dict(self.streams)
+        done = sum(s[0] for s in streams.values())
+        expected = (sum(s[1] or 0 for s in streams.values())
+                    + sum(size or 0 for fid, size in self.stream_sizes.items() if fid not in streams))
+        return done, expected or None
+
+    @property
+    def streams_finished(self):
+        streams = dict(self.streams)
+        return all(streams.get(fid, (0, 0, False))[2] for fid in self.stream_sizes or streams)
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+
+# Chegaralangan worker pool: har bir worker navbatdan bitta job oladi.
+# backlog > 0 bo'lsa navbat ham chegaralanadi va submit() joy bo'shaguncha kutadi.
+class DownloadQueue:
+    def __init__(self, worker, max_workers=MAX_CONCURRENT_DOWNLOADS, backlog=0):
+        self._worker = worker
+        self._pending = queue.Queue(backlog)
+        self._lock = threading.Lock()
+        self._threads = 0
+        self.max_workers = max_workers
+
+    def submit(self, job):
+        self._pending.put(job)
+        self._spawn_workers()
+
+    def set_max_workers(self, n):
+        with self._lock:
+            self.max_workers = max(1, int(n))
+        self._spawn_workers()
+
+    def join(self):
+        self._pending.join()
+
+    def _spawn_workers(self):
+        with self._lock:
+            # Ishlayotgan worker'lar band: bo'sh o'rinlar soni bilan navbatdagilarni solishtiramiz
+            missing = min(self.max_workers - self._threads, self._pending.qsize())
+            for _ in range(max(0, missing)):
+                self._threads += 1
+                threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                # Limit kamaytirilgan yoki navbat bo'sh bo'lsa worker chiqib ketadi
+                if self._threads > self.max_workers or self._pending.empty():
+                    self._threads -= 1
+                    return
+                job = self._pending.get_nowait()
+            try:
+                self._worker(job)
+            except Exception:
+                # Worker xatolarni o'zi job holatiga yozadi; bu yerga yetgani (masalan disk to'lib,
+                # jurnalga yozib bo'lmadi) thread'ni o'ldirmasin — aks holda o'rni qaytmaydi
+                traceback.print_exc()
+            finally:
+                self._pending.task_done()
+
+
+# yt_dlp va segmented.py (u transcode.py va writer.py ni tortadi) faqat shu yerda import
+# qilinadi. segmented/transcode engine'dan konstantalarni oladi; `python -m engine` da bu
+# modul "__main__" nomi bilan yuklangan, shuning uchun engine ikkinchi marta bajarilmasin deb
+# u sys.modules'ga "engine" sifatida ham qo'yiladi. (yt_dlp, segmented) qaytaradi
+def load_downloader():
+    sys.modules.setdefault('engine', sys.modules[__name__])
+    import yt_dlp
+    import segmented
+    return yt_dlp, segmented
+
+
+# yt_dlp va extractor registrini (hamda arxivni) oldindan yuklab qo'yadi
+def warm_up(archive=None):
+    from yt_dlp.extractor import gen_extractor_classes
+    list(gen_extractor_classes())
+    if archive is not None:
+        archive.load()
+
+
+# Ko'p havolali ro'yxat uchun metadata'ni (va after_fetch — masalan thumbnail) oldindan oladi.
+# asyncio loop alohida thread'da ishlaydi; yt-dlp bloklovchi bo'lgani uchun har bir extract
+# executor'da bajariladi, semafor esa bir vaqtdagi ishlarni `concurrency` ta bilan cheklaydi.
+# Bir xil video (URL ko'rinishi har xil bo'lsa ham, ID bo'yicha) bir marta olinadi.
+# Natijalar tayyor bo'lishi bilan, istalgan tartibda on_result(url, kind, payload) ga beriladi
+# (loop thread'idan — callback tez qaytishi kerak):
+#   "video"     → info dict (engine.info_cache'ga ham tushadi, submit() qayta extract qilmaydi)
+#   "playlist"  → PlaylistSource
+#   "duplicate" → shu videoning birinchi uchragan URL'i
+#   "archived"  → archive id (tarmoqqa chiqilmaydi)
+#   "error"     → xato matni
+class MetadataPrefetcher:
+    def __init__(self, engine, on_result, after_fetch=None, concurrency=PREFETCH_CONCURRENCY, skip_archived=True):
+        self.engine = engine
+        self.on_result = on_result
+        self.after_fetch = after_fetch
+        self.concurrency = concurrency
+        self.skip_archived = skip_archived
+        self._cancelled = False
+
+    # Fon thread'ini ishga tushiradi; thread.join() — hammasi tugaguncha kutish
+    def start(self, urls):
+        import asyncio   # ~50 ms; faqat havolalar ro'yxati ochilganda kerak
+        thread = threading.Thread(target=asyncio.run, args=(self._run(list(urls)),), daemon=True)
+        thread.start()
+        return thread
+
+    # Hali boshlanmagan havolalar tashlab ketiladi, olinayotganlari tugaydi
+    def cancel(self):
+        self._cancelled = True
+
+    async def _run(self, urls):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix="prefetch")
+        semaphore = asyncio.Semaphore(self.concurrency)
+        seen = {}   # archive id (yoki URL) → birinchi URL
+
+        def claim(key, url):
+            # await'siz: tekshirish va yozish orasida boshqa coroutine ishlamaydi
+            if key in seen:
+                self.on_result(url, "duplicate", seen[key])
+                return False
+            seen[key] = url
+            return True
+
+        async def resolve(url):
+            async with semaphore:
+                if self._cancelled:
+                    return
+                try:
+                    key = await loop.run_in_executor(executor, archive_id_for_url, url)
+                    if not claim(key or url, url):
+                        return
+                    if self.skip_archived and key in self.engine.archive:
+                        self.on_result(url, "archived", key)
+                        return
+                    result = await loop.run_in_executor(executor, self.engine.fetch_info, url)
+                    if isinstance(result, PlaylistSource):
+                        self.on_result(url, "playlist", result)
+                        return
+                    video_id = archive_id_for_info(result)
+                    if video_id and video_id != key and not claim(video_id, url):
+                        return
+                    if self.skip_archived and video_id in self.engine.archive:
+                        self.on_result(url, "archived", video_id)
+                        return
+                    self.on_result(url, "video", result)
+                except Exception as e:
+                    self.on_result(url, "error", str(e))
+                    return
+                if self.after_fetch is not None:
+                    try:
+                        await loop.run_in_executor(executor, self.after_fetch, url, result)
+                    except Exception:
+                        pass   # thumbnail kabi qo'shimcha ish natijaga ta'sir qilmaydi
+
+        try:
+            await asyncio.gather(*(resolve(url) for url in urls))
+        finally:
+            executor.shutdown(wait=False)
+
+
+# Format tanlangandan keyin diskda eng ko'p band bo'ladigan joy (bayt) yoki None (hajm noma'lum).
+# video+audio: merge paytida stream'lar va natija fayli birga turadi (~2x);
+# audio: stream qilib kodlansa faqat mp3, aks holda asl stream + mp3. Stream qilib kodlash
+# mumkinligini StreamingTranscodeFD.can_download hal qiladi (fragmentli/HLS, oddiy m4a/mp4 va
+# ffmpeg bo'lmasa — yo'q), shuning uchun taxmin ham xuddi shu shartga tayanadi.
+# probe(fmt) — hajmi formatlar ro'yxatida bo'lmagan stream uchun (masalan HEAD so'rovi bilan).
+# (bayt, rate) qaytaradi: rate — yuklangan har bir bayt uchun diskka yoziladigan bayt
+# (stream qilib kodlashda faqat mp3 o'sadi, shuning uchun 1 dan kichik).
+def estimate_disk_usage(info, mode, stream_transcode=True, probe=None):
+    duration = info.get('duration')
+    formats = info.get('requested_formats') or [info]
+    sizes = [format_size(f, duration) or (probe(f) if probe is not None else None) for f in formats]
+    if None in sizes:
+        return None
+    total = sum(sizes)
+    rate = 1.0
+    if mode == "audio":
+        mp3 = int(duration * int(AUDIO_QUALITY) * 1000 / 8) if duration else total
+        if stream_transcode:
+            _, segmented = load_downloader()
+            stream_transcode = segmented.StreamingTranscodeFD.can_download(
+                info, {'stream_transcode': {'codec': AUDIO_CODEC, 'quality': AUDIO_QUALITY}})
+        if stream_transcode:
+            need = mp3
+            rate = mp3 / total if total else 1.0
+        else:
+            need = total + mp3
+    elif len(formats) > 1:
+        need = 2 * total
+    else:
+        need = total
+    return int(need * (1 + DISK_SIZE_MARGIN)), rate * (1 + DISK_SIZE_MARGIN)
+
+
+class DiskSpaceError(Exception):
+    pass
+
+
+# Natija ombordan (ContentStore) olindi — yuklash boshlanmasdan to'xtatiladi
+class ContentReused(Exception):
+    def __init__(self, path, method):
+        super().__init__(f"{path} ({method})")
+        self.path = path
+        self.method = method
+
+
+# Bir diskka (st_dev) yozayotgan job'lar uchun joy band qilish. Job yuklash boshlanishidan oldin
+# kerakli joyni so'raydi: diskda (boshqa job'lar band qilganini ayirib) yetarli bo'lsa darhol,
+# aks holda band qilinganlar bo'shaguncha kutadi. Hech kim band qilmagan bo'lsa ham joy
+# yetmasa — kutishdan foyda yo'q, DiskSpaceError. Band qilingan joy job tugaganda qaytariladi.
+# Job yozgan baytlar disk_usage().free'dan allaqachon ayrilgan — ulushdan faqat hali
+# yozilmagan qismi hisoblanadi (progress() bilan yangilanadi), aks holda ular ikki marta ayriladi.
+class DiskSpaceGate:
+    def __init__(self, reserve=DISK_FREE_RESERVE, poll_interval=DISK_POLL_INTERVAL):
+        self.reserve = reserve
+        self.poll_interval = poll_interval
+        self._held = {}              # job key → [st_dev, bayt, yozilgan bayt]
+        self._cond = threading.Condition()
+
+    def acquire(self, job, folder, need, on_wait=None):
+        path = existing_parent(folder)
+        device = os.stat(path).st_dev
+        waited = False
+        with self._cond:
+            while True:
+                # Shu job'ning oldingi ulushi (403 dan keyin qayta yuklash) yangisi bilan almashtiriladi
+                held = sum(max(0, size - written) for key, (dev, size, written) in self._held.items()
+                           if dev == device and key != job.key)
+                free = shutil.disk_usage(path).free
+                if free - held - need >= self.reserve:
+                    self._held[job.key] = [device, need, 0]
+                    return
+                if not held:
+                    raise DiskSpaceError(f"Diskda joy yetarli emas: kerak ~{need / 2 ** 20:.0f} MB, "
+                                         f"bo'sh {max(0, free - self.reserve) / 2 ** 20:.0f} MB ({path})")
+                if not waited and on_wait is not None:
+                    waited = True
+                    on_wait()
+                # Boshqa job tugaganda release() uyg'otadi; disk tashqaridan bo'shashi uchun vaqti-vaqti bilan ham
+                self._cond.wait(self.poll_interval)
+
+    # written — job shu paytgacha diskka yozgan bayt (ulushdan oshmaydi)
+    def progress(self, job, written):
+        with self._cond:
+            hold = self._held.get(job.key)
+            if hold is not None:
+                hold[2] = min(written, hold[1])
+
+    def release(self, job):
+        with self._cond:
+            if self._held.pop(job.key, None) is not None:
+                self._cond.notify_all()
+
+    # Hali yozilmagan band qilingan joy
+    def held(self):
+        with self._cond:
+            return sum(max(0, size - written) for _, size, written in self._held.values())
+
+
+def existing_parent(path):
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+# Tayyor fayl qaysi yuklashdan chiqqanini bildiradi: video ID, tanlangan format(lar)
+# va post-processing retsepti. Bir xil kalit → baytma-bayt bir xil natija
+def content_key(archive_id, format_id, mode):
+    recipe = f"{AUDIO_CODEC}-{AUDIO_QUALITY}k" if mode == "audio" else "merge-mp4"
+    return f"{archive_id} {format_id} {recipe}"
+
+
+# Yuklash davomida hisoblangan stream hash'laridan natija fayli digest'i (fayl qayta o'qilmaydi).
+# stream_hashes: format_id → hashlib obyekti; birortasi yo'q bo'lsa None
+def content_digest(key, stream_hashes):
+    _, format_id, recipe = key.rsplit(" ", 2)   # archive id'da bo'sh joy bor ("youtube <id>")
+    format_ids = format_id.split("+")
+    if any(fid not in stream_hashes for fid in format_ids):
+        return None
+    digest = hashlib.sha256(recipe.encode())
+    for fid in format_ids:
+        digest.update(f"\n{fid} {stream_hashes[fid].hexdigest()}".encode())
+    return digest.hexdigest()
+
+
+# source'dan target yaratadi (target mavjud bo'lmasligi kerak); usul nomini qaytaradi.
+# reflink — alohida fayl, bloklar umumiy; hardlink — bitta inode (bitta diskda);
+# ikkalasi bo'lmasa oddiy nusxa (tarmoqdan qayta yuklashdan baribir tez)
+def link_file(source, target):
+    if sys.platform.startswith("linux"):
+        import fcntl
+        try:
+            with open(source, 'rb') as src, open(target, 'xb') as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return "reflink"
+        except OSError:
+            if os.path.exists(target):
+                os.remove(target)
+    try:
+        os.link(source, target)
+        return "hardlink"
+    except OSError:
+        pass
+    tmp_path = target + ".part"
+    shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+    return "copy"
+
+
+# Yuklangan fayllar ombori: content_key → fayl. Obyektlar STORE_DIR/objects/ ichida digest nomi
+# bilan hardlink sifatida turadi (foydalanuvchi papkadagi nusxani o'chirsa ham yo'qolmaydi),
+# boshqa diskdagi yuklashlar esa joylashgan yo'li bilan eslab qolinadi. Xuddi shu kalit yana
+# so'ralsa fayl yangi papkaga reflink/hardlink qilinadi va tarmoqqa chiqilmaydi.
+# Indeks append-only JSON lines (JobJournal kabi), birinchi murojaatda birlashtirilib qayta yoziladi;
+# faqat omborda qolgan obyektlar (hech bir papkada nusxasi yo'q) shu paytda o'chiriladi.
+# root=None — ombor o'chiq (benchmark'lar uchun).
+class ContentStore:
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, "index.jsonl") if root else None
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        if self.root is None:
+            return []
+        with self._lock:
+            entry = self._load().get(key)
+        if entry is None:
+            return []
+        paths = ([self._object_path(entry)] if entry.get('object') else []) + entry['paths']
+        return [p for p in paths if self._valid(p, entry['size'])]
+
+    # Kalit bo'yicha tayyor faylni target'ga joylaydi; usul ("reflink"/"hardlink"/"copy") yoki None
+    def place(self, key, target):
+        sources = self.lookup(key)
+        if not sources or os.path.exists(target):
+            return None
+        # Hardlink faqat bitta diskda ishlaydi — avval target bilan bir diskdagi nusxa
+        device = os.stat(existing_parent(target)).st_dev
+        sources.sort(key=lambda p: os.stat(p).st_dev != device)
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        method = link_file(sources[0], target)
+        with self._lock:
+            entry = self._load()[key]
+            if target not in entry['paths']:
+                entry['paths'].append(target)
+                self._append(entry)
+        return method
+
+    # Yangi yuklangan faylni omborga qo'shadi. digest yuklash davomida hisoblangan bo'lsa va shunday
+    # obyekt allaqachon bo'lsa, fayl unga ulanadi (diskda ikkinchi nusxa qolmaydi)
+    def add(self, key, path, digest=None):
+        if self.root is None or not os.path.isfile(path):
+            return
+        size = os.path.getsize(path)
+        content = digest is not None
+        entry = {'key': key, 'size': size, 'content': content, 'paths': [path],
+                 'digest': digest or hashlib.sha256(key.encode()).hexdigest(),
+                 'ext': os.path.splitext(path)[1]}
+        with self._lock:
+            old = self._load().get(key)
+            if old is not None:
+                entry['paths'] += [p for p in old['paths'] if p != path and self._valid(p, old['size'])]
+            entry['object'] = self._store_object(entry, path)
+            self._entries[key] = entry
+            self._append(entry)
+
+    def _store_object(self, entry, path):
+        obj = self._object_path(entry)
+        if self._valid(obj, entry['size']):
+            if entry['content'] and not os.path.samefile(obj, path):
+                tmp_path = path + ".dedup"
+                try:
+                    link_file(obj, tmp_path)
+                    os.replace(tmp_path, path)
+                except OSError:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+            return True
+        try:
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            if os.path.exists(obj):
+                os.remove(obj)   # eski, hajmi mos kelmagan obyekt
+            os.link(path, obj)
+            return True
+        except OSError:
+            return False   # boshqa disk yoki hardlink qo'llanmaydi — yo'l bilan eslab qolinadi
+
+    def _object_path(self, entry):
+        digest = entry['digest']
+        return os.path.join(self.root, "objects", digest[:2], digest + entry['ext'])
+
+    @staticmethod
+    def _valid(path, size):
+        try:
+            return os.path.getsize(path) == size
+        except OSError:
+            return False
+
+    def _load(self):
+        if self._entries is not None:
+            return self._entries
+        entries = {}
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # oxirgi qator yarim yozilgan bo'lishi mumkin
+                    entries[entry['key']] = entry
+        except FileNotFoundError:
+            pass
+        for key, entry in list(entries.items()):
+            if entry.get('object'):
+                obj = self._object_path(entry)
+                try:
+                    if os.stat(obj).st_nlink == 1:
+                        os.remove(obj)   # hech bir papkada qolmagan — diskni egallab turmasin
+                except OSError:
+                    pass
+                entry['object'] = self._valid(obj, entry['size'])
+            entry['paths'] = [p for p in entry['paths'] if self._valid(p, entry['size'])]
+            if not entry['object'] and not entry['paths']:
+                del entries[key]
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries.values()))
+        os.replace(tmp_path, self.index_path)
+        self._entries = entries
+        return entries
+
+    def _append(self, entry):
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+# add_post_processor(..., when=...) bosqichida info dict'ni callback'ga beradi:
+# 'after_filter' — extract tugadi, format hali tanlanmagan; 'before_dl' — yuklashdan oldin
+def make_info_hook(callback):
+    from yt_dlp.postprocessor.common import PostProcessor
+
+    class InfoHook(PostProcessor):
+        def run(self, info):
+            callback(info)
+            return [], info
+
+    return InfoHook()
+
+
+# GUI va CLI uchun umumiy engine. Holat o'zgarishlari callback'lar orqali beriladi:
+#   on_state(job)                       — job.state o'zgarganda (istalgan thread'dan)
+#   on_progress(job, downloaded, total) — har bir yt-dlp progress hook'ida
+#   make_logger(job)                    — yt-dlp uchun logger (None = standart)
+# journal berilsa, tugallanmagan job'lar keyingi ishga tushishda davom ettiriladi.
+# segment_connections/segment_chunk_size — progressive formatlarni bo'laklab yuklash (segmented.py).
+# parallel_streams — video va audio stream'larni merge'dan oldin bir vaqtda yuklash.
+# stream_transcode — audio'ni yuklash davomida ffmpeg orqali mp3'ga kodlash (transcode.py).
+# rate_limit/job_rate_limit — umumiy va bitta job uchun tezlik limiti (bayt/s, BandwidthScheduler).
+# http_pool — metadata va yuklashlar uchun umumiy keep-alive ulanishlar (HttpPool).
+# tracer — bosqichlar bo'yicha vaqt va bayt o'lchovlari (StageTracer, engine.tracer).
+# disk_reserve — diskda doim bo'sh qoladigan joy; yuklash faqat taxminiy hajmi sig'sa
+# boshlanadi, aks holda boshqa job'lar joyni bo'shatguncha "waiting" holatida kutadi (DiskSpaceGate).
+# store — avval yuklangan fayllar ombori (ContentStore): xuddi shu video, format va retsept
+# boshqa papkaga so'ralsa fayl yuklanmaydi, reflink/hardlink qilinadi.
+# Merge va mp3 kodlash alohida bosqichda (postprocess_workers ta worker) bajariladi:
+# download worker tayyor fayllarni unga berib, darhol keyingi havolani oladi. Bosqich
+# navbati to'lsa download worker kutadi, shuning uchun diskdagi ishlanmagan oraliq
+# fayllar soni max_workers + 2 * postprocess_workers dan oshmaydi.
+class DownloadEngine:
+    def __init__(self, max_workers=MAX_CONCURRENT_DOWNLOADS, archive=None, journal=None,
+                 on_state=None, on_progress=None, make_logger=None,
+                 segment_connections=SEGMENT_CONNECTIONS, segment_chunk_size=SEGMENT_CHUNK_SIZE,
+                 parallel_streams=True, stream_transcode=True, postprocess_workers=POSTPROCESS_WORKERS,
+                 rate_limit=None, job_rate_limit=None, http_pool=None, tracer=None, disk_reserve=DISK_FREE_RESERVE,
+                 store=None):
+        self.parallel_streams = parallel_streams
+        self.stream_transcode = stream_transcode
+        self.segment_connections = segment_connections
+        self.segment_chunk_size = segment_chunk_size
+        self.info_cache = MetadataCache()
+        self.bandwidth = BandwidthScheduler(rate_limit, job_rate_limit)
+        self.http_pool = http_pool if http_pool is not None else HttpPool()
+        self.tracer = tracer if tracer is not None else StageTracer()
+        self.disk = DiskSpaceGate(disk_reserve)
+        self.store = store if store is not None else ContentStore()
+        self.archive = archive if archive is not None else DownloadArchive()
+        self.journal = journal
+        self.queue = DownloadQueue(self.run_job, max_workers)
+        self.postprocess = DownloadQueue(self.run_postprocess, postprocess_workers, backlog=postprocess_workers)
+        self.jobs = {}
+        self.on_state = on_state or (lambda job: None)
+        self.on_progress = on_progress or (lambda job, downloaded, total: None)
+        self.make_logger = make_logger or (lambda job: None)
+
+    def is_archived(self, url):
+        return archive_id_for_url(url) in self.archive
+
+    # Bitta video uchun info dict, playlist/kanal uchun PlaylistSource qaytaradi
+    # Video uchun natija har doim process_ie_result'dan o'tgan (thumbnail, duration_string,
+    # tanlangan format) — keshdan olinganda ham
+    def fetch_info(self, url):
+        _, segmented = load_downloader()
+        # Avval olingan video (har qanday URL ko'rinishida) tarmoqsiz qaytariladi; unga
+        # extractor'lar kerak emas (auto_init=False ularni ro'yxatga olishdagi ~80 ms'ni tejaydi)
+        info = self.info_cache.get_metadata(url)
+        ydl = segmented.SegmentedYoutubeDL({'quiet': True, 'extract_flat': 'in_playlist', 'lazy_playlist': True,
+                                            'http_pool': self.http_pool}, auto_init=info is None)
+        try:
+            if info is None:
+                with self.tracer.span(None, "extract"):
+                    info = ydl.extract_info(url, download=False, process=False)
+                if info.get('_type') in ('playlist', 'multi_video'):
+                    # ydl endi PlaylistSource'ga tegishli, entry'lar yuklash paytida olinadi
+                    playlist, ydl = PlaylistSource(ydl, info), None
+                    return playlist
+                # Keshga extractor natijasi yoziladi: process_ie_result tanlangan format maydonlarini
+                # (requested_formats, url, format_id) info'ning o'ziga qo'shadi va keyingi boshqa
+                # rejimdagi yuklash (masalan audio) eski video+audio tanlovini yuklab qo'yadi
+                self.info_cache.put(url, copy.deepcopy(info))
+            return ydl.process_ie_result(info, download=False)
+        finally:
+            if ydl is not None:
+                ydl.close()
+
+    # force=False: arxivdagi video yuklanmaydi ("skipped"); True — foydalanuvchi qayta yuklashni so'ragan
+    def submit(self, url, mode, out_folder, quality=None, title=None, format_id=None, key=None, priority="normal",
+               force=False):
+        job = DownloadJob(url, mode, out_folder, quality, key)
+        job.format_id = format_id
+        job.priority = priority
+        job.force = force
+        info = self.info_cache.peek(url)
+        if info and format_id:
+            job.expected_size = estimate_size(info, format_id)
+        if info and info.get('title'):
+            job.title = info['title']
+        elif title:
+            job.title = title
+        if info:
+            job.archive_id = archive_id_for_info(info)
+        self.jobs[job.id] = job
+        if self.journal is not None:
+            self.journal.record(job, url=url, mode=mode, out_folder=out_folder, quality=quality,
+                                title=job.title, format_id=format_id, force=force, state="queued")
+        self.on_state(job)
+        self.queue.submit(job)
+        return job
+
+    # Entry'lar topilishi bilan navbatga tushadi; (qo'shilgan, o'tkazilgan) qaytaradi
+    def submit_playlist(self, playlist, mode, out_folder, quality=None, force=False):
+        count = skipped = 0
+        for url, title, archive_id in playlist:
+            if not force and (archive_id or archive_id_for_url(url)) in self.archive:
+                skipped += 1
+                continue
+            count += 1
+            self.submit(url, mode, out_folder, quality, title, priority="low", force=force)
+        return count, skipped
+
+    # Oldingi sessiyada tugamay qolgan job'larni navbatga qaytaradi
+    def resume_pending(self):
+        if self.journal is None:
+            return 0
+        entries = self.journal.pending()
+        for e in entries:
+            self.submit(e['url'], e['mode'], e['out_folder'], e.get('quality'), e.get('title'),
+                        format_id=e.get('format_id'), key=e['key'], force=e.get('force', False))
+        return len(entries)
+
+    def set_max_workers(self, n):
+        self.queue.set_max_workers(n)
+
+    # Limitlar bayt/s da; 0 yoki None = cheklovsiz. Ishlab turgan job'larga darhol ta'sir qiladi
+    def set_bandwidth(self, rate=None, job_rate=None):
+        self.bandwidth.set_limits(rate, job_rate)
+
+    # Foydalanuvchi kuzatayotgan job tarmoqdan katta ulush oladi
+    def set_focus(self, job):
+        self.bandwidth.set_focus(job.key if job is not None else None)
+
+    def wait(self):
+        self.queue.join()
+        self.postprocess.join()
+
+    def _set_state(self, job, state):
+        job.state = state
+        if state in FINISHED_STATES:
+            self.disk.release(job)
+        if self.journal is not None and state in FINISHED_STATES:
+            self.journal.record(job, state=state)
+        self.on_state(job)
+
+    def _after_extract(self, job, info):
+        self.tracer.end(job, "extract")
+        self.tracer.begin(job, "format-select")
+
+    def _before_download(self, job, info):
+        self.tracer.end(job, "format-select")
+        formats = info.get('requested_formats') or [info]
+        job.stream_sizes = {f.get('format_id'): f.get('filesize') or f.get('filesize_approx') for f in formats}
+        job.streams = {}
+        if job.expected_size is None and job.stream_sizes and None not in job.stream_sizes.values():
+            job.expected_size = sum(job.stream_sizes.values())
+        format_id = info.get('format_id')
+        if format_id and format_id != job.format_id:
+            job.format_id = format_id
+            if self.journal is not None:
+                self.journal.record(job, format_id=format_id)
+        self._reuse_stored(job, info)
+        # Sig'maydigan yuklashni boshlab, yarmida disk to'lishini kutmaymiz
+        usage = estimate_disk_usage(info, job.mode, self.stream_transcode, probe=self._content_length)
+        job.disk_rate = None
+        if usage is not None:
+            need, job.disk_rate = usage
+            self.disk.acquire(job, job.out_folder, need, on_wait=lambda: self._wait_for_disk(job))
+            if job.state == "waiting":
+                self.tracer.end(job, "disk-wait")
+                self._set_state(job, "downloading")
+        self.tracer.begin(job, "transfer")
+
+    # Xuddi shu natija omborda bo'lsa uni papkaga joylab, yuklashni ContentReused bilan to'xtatadi.
+    # Fayl papkada allaqachon bo'lsa yt-dlp uni o'zi o'tkazadi — u omborga qo'shilmaydi
+    # (kalitga mosligi noma'lum, masalan boshqa sifatdagi shu nomli fayl)
+    def _reuse_stored(self, job, info):
+        job.content_key = None
+        job.stream_hashes = {}
+        archive_id = job.archive_id or archive_id_for_info(info)
+        target = info.get('_filename')
+        if self.store.root is None or not archive_id or not info.get('format_id') or not target:
+            return
+        if job.mode == "audio":
+            target = os.path.splitext(target)[0] + "." + AUDIO_CODEC
+        if os.path.exists(target):
+            return
+        job.content_key = content_key(archive_id, info['format_id'], job.mode)
+        with self.tracer.span(job, "dedup"):
+            method = self.store.place(job.content_key, target)
+        if method is not None:
+            raise ContentReused(target, method)
+
+    # SegmentedFD/StreamingTranscodeFD ('output_consumers') stream baytlarini shu hash'ga beradi
+    def _hash_stream(self, job, info):
+        if job.content_key is None:
+            return []
+        digest = hashlib.sha256()
+        job.stream_hashes[info.get('format_id')] = digest
+        return [digest.update]
+
+    # To'g'ridan-to'g'ri http(s) stream'ning hajmi (Content-Length) yoki None
+    def _content_length(self, fmt):
+        if fmt.get('fragments') or (fmt.get('protocol') or '').split('+')[0] not in ('http', 'https'):
+            return None
+        try:
+            response = self.http_pool.session().head(fmt['url'], headers=fmt.get('http_headers'),
+                                                     allow_redirects=True, timeout=10)
+            response.close()
+            return int(response.headers['Content-Length']) if response.ok else None
+        except Exception:
+            return None   # hajm noma'lum — joy band qilinmaydi
+
+    def _wait_for_disk(self, job):
+        self.tracer.begin(job, "disk-wait")
+        self._set_state(job, "waiting")
+
+    def run_job(self, job):
+        # Har bir worker o'z ydl_opts va YoutubeDL nusxasini quradi
+        url = job.url
+        try:
+            # try ichida: import xatosi ham job'ni "failed" qiladi va worker o'rni bo'shaydi
+            yt_dlp, segmented = load_downloader()
+            logger = self.make_logger(job)
+            if job.archive_id is None:
+                job.archive_id = archive_id_for_url(url)
+            if job.archive_id in self.archive and not job.force:
+                # Navbatda turganida boshqa job shu videoni yuklab bo'lgan bo'lishi mumkin
+                self._set_state(job, "skipped")
+                return
+            self._set_state(job, "extracting")
+            self.tracer.begin(job, "extract")
+
+            ydl_opts = build_ydl_opts(job.mode, job.out_folder, job.quality, job.format_id)
+            if logger is not None:
+                ydl_opts['logger'] = logger
+            ydl_opts['segmented'] = {'connections': self.segment_connections, 'chunk_size': self.segment_chunk_size}
+            ydl_opts['parallel_streams'] = self.parallel_streams
+            ydl_opts['bandwidth'] = self.bandwidth.channel(job.key, job.priority)
+            ydl_opts['http_pool'] = self.http_pool
+            postprocess_steps = []
+            ydl_opts['defer_postprocess'] = postprocess_steps.append
+            ydl_opts['postprocessor_hooks'] = [lambda d: self._postprocessor_hook(job, d)]
+            ydl_opts['output_consumers'] = lambda filename, info: self._hash_stream(job, info)
+            if job.mode == "audio" and self.stream_transcode:
+                ydl_opts['stream_transcode'] = {'codec': AUDIO_CODEC, 'quality': AUDIO_QUALITY}
+                ydl_opts['final_ext'] = AUDIO_CODEC   # tayyor mp3 bo'lsa qayta yuklanmaydi
+                ydl_opts['fixup'] = 'never'           # asl konteyner diskka yozilmaydi
+
+            with segmented.SegmentedYoutubeDL(ydl_opts) as ydl:
+                ydl.add_progress_hook(lambda d: self._progress_hook(job, d))
+                ydl.add_post_processor(make_info_hook(lambda i: self._after_extract(job, i)),
+                                       when='after_filter')
+                ydl.add_post_processor(make_info_hook(lambda i: self._before_download(job, i)),
+                                       when='before_dl')
+                info = self.info_cache.get(url)
+                if info is None:
+                    ydl.download([url])
+                else:
+                    try:
+                        ydl.process_ie_result(info, download=True)
+                    except yt_dlp.utils.DownloadError as e:
+                        if not is_forbidden_error(e):
+                            raise
+                        # Keshdagi URL eskirgan → qaytadan extract qilamiz
+                        self.info_cache.expire_streams(url)
+                        ydl.report_warning("Kesh eskirgan (403), ma'lumot qayta olinmoqda...")
+                        ydl.download([url])
+
+            if postprocess_steps:
+                # Bosqich navbati to'lgan bo'lsa shu yerda kutamiz (backpressure)
+                self.postprocess.submit((job, postprocess_steps))
+            else:
+                self._finish(job)
+
+        except ContentReused as e:
+            job.output_path, job.reused = e.path, e.method
+            self._finish(job)
+        except Exception as e:
+            job.error = str(e)
+            self.tracer.end_all(job, job.error)
+            self._set_state(job, "failed")
+
+    # Post-processing bosqichining worker'i: yt-dlp qoldirgan merge/ExtractAudio qadamlari
+    def run_postprocess(self, item):
+        job, steps = item
+        try:
+            for step in steps:
+                step()
+            self._finish(job)
+        except Exception as e:
+            job.error = str(e)
+            self.tracer.end_all(job, job.error)
+            self._set_state(job, "failed")
+
+    def _finish(self, job):
+        self.tracer.end_all(job)
+        if job.archive_id:
+            self.archive.add(job.archive_id)
+        if job.content_key and job.output_path and not job.reused:
+            try:
+                self.store.add(job.content_key, job.output_path, content_digest(job.content_key, job.stream_hashes))
+            except OSError:
+                pass   # ombor ishlamasa ham yuklash muvaffaqiyatli
+        job.percent = 100.0
+        self._set_state(job, "done")
+
+    def _progress_hook(self, job, d):
+        info = d.get('info_dict') or {}
+        if d['status'] == 'downloading':
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            done, expected = job.update_stream(info.get('format_id'), d.get('downloaded_bytes') or 0, total)
+            self.on_progress(job, done, expected)
+            if job.disk_rate is not None:
+                self.disk.progress(job, int(done * job.disk_rate))
+            if job.state != "downloading":
+                self._set_state(job, "downloading")
+        elif d['status'] == 'finished':
+            total = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+            done, _ = job.update_stream(info.get('format_id'), total, total, finished=True)
+            if job.disk_rate is not None:
+                self.disk.progress(job, int(done * job.disk_rate))
+            if job.archive_id is None:
+                job.archive_id = archive_id_for_info(info)
+            # video+audio: post-processing faqat ikkala stream ham tugaganda boshlanadi
+            if job.streams_finished:
+                self.tracer.end(job, "transfer", size=sum(s[0] for s in job.streams.values()))
+                self._set_state(job, "post-processing")
+
+    def _postprocessor_hook(self, job, d):
+        key = d['postprocessor']
+        stage = PP_STAGES.get(key) or ('fixup' if key.startswith('Fixup') else None)
+        if stage is None:
+            return   # make_info_hook va boshqa ichki PP'lar
+        if d['status'] == 'started':
+            self.tracer.begin(job, stage)
+        elif d['status'] == 'finished':
+            path = (d.get('info_dict') or {}).get('filepath')
+            if key == 'MoveFiles':
+                job.output_path = path
+            self.tracer.end(job, stage, size=os.path.getsize(path) if path and os.path.exists(path) else None)
+
+
+# ────────────────────────────────────────────────
+# CLI
+# ────────────────────────────────────────────────
+class ConsoleLogger:
+    def __init__(self, prefix="", verbose=False):
+        self.prefix = prefix
+        self.verbose = verbose
+
+    def debug(self, msg):
+        if self.verbose and not msg.startswith('[debug] '):
+            self.info(msg)
+
+    def info(self, msg):
+        if self.verbose:
+            print(f"{self.prefix}{msg}", file=sys.stderr)
+
+    def warning(self, msg):
+        print(f"{self.prefix}[WARNING] {msg}", file=sys.stderr)
+
+    def error(self, msg):
+        print(f"{self.prefix}[ERROR] {msg}", file=sys.stderr)
+
+
+def print_stage_stats(tracer, out):
+    print(f"{'bosqich':<14}{'soni':>6}{'xato':>6}{'p50':>10}{'p95':>10}{'hajm':>12}", file=out)
+    for stage, s in tracer.stats().items():
+        print(f"{stage:<14}{s['count']:>6}{s['errors']:>6}{s['p50']:>9.3f}s{s['p95']:>9.3f}s"
+              f"{s['bytes'] / (1024 * 1024):>9.1f} MiB", file=out)
+
+
+def read_urls(stream):
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m engine", description="YouTube Downloader (GUI'siz rejim)")
+    parser.add_argument("input", nargs="?", default="-", help="havolalar fayli (har qatorda bitta), '-' = stdin")
+    parser.add_argument("-o", "--output", default=".", help="saqlash papkasi")
+    parser.add_argument("--audio", action="store_true", help="faqat audio (mp3)")
+    parser.add_argument("-q", "--quality", default="720p", choices=["360p", "480p", "720p", "1080p", "best"])
+    parser.add_argument("-j", "--jobs", type=int, default=MAX_CONCURRENT_DOWNLOADS, help="bir vaqtda nechta yuklash")
+    parser.add_argument("--connections", type=int, default=SEGMENT_CONNECTIONS,
+                        help="bitta fayl uchun parallel ulanishlar (1 = bo'laklamasdan)")
+    parser.add_argument("--chunk-size", type=int, default=SEGMENT_CHUNK_SIZE // (1024 * 1024),
+                        help="bitta Range so'rovi hajmi (MiB)")
+    parser.add_argument("--limit-rate", type=int, default=0, help="umumiy tezlik limiti (KiB/s), 0 = cheklovsiz")
+    parser.add_argument("--job-rate", type=int, default=0, help="bitta yuklash tezligi limiti (KiB/s)")
+    parser.add_argument("--no-stream-transcode", action="store_true",
+                        help="audio'ni avval to'liq yuklab, keyin mp3'ga o'girish")
+    parser.add_argument("--force", action="store_true", help="arxivdagi videolarni ham qayta yuklash")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="avval yuklangan faylni ombordan ulamasdan, har doim qayta yuklash")
+    parser.add_argument("--disk-reserve", type=int, default=DISK_FREE_RESERVE // (1024 * 1024),
+                        help="diskda doim bo'sh qoldiriladigan joy (MiB)")
+    parser.add_argument("--metrics-port", type=int, help="Prometheus /metrics uchun lokal port")
+    parser.add_argument("--stats", action="store_true", help="oxirida bosqichlar bo'yicha p50/p95 ni chiqarish")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    mode = "audio" if args.audio else "video"
+    quality = None if args.audio else (BEST_QUALITY if args.quality == "best" else args.quality)
+    out_folder = os.path.abspath(os.path.expanduser(args.output))
+    print_lock = threading.Lock()
+
+    def on_state(job):
+        if job.state in ("queued", "waiting", "downloading", "done", "failed", "skipped"):
+            suffix = f": {job.error}" if job.error else f" (ombordan, {job.reused})" if job.reused else ""
+            with print_lock:
+                print(f"[#{job.id}] {job.state:<10} {job.title}{suffix}", file=sys.stderr)
+
+    engine = DownloadEngine(max_workers=args.jobs, on_state=on_state,
+                            segment_connections=args.connections, segment_chunk_size=args.chunk_size * 1024 * 1024,
+                            stream_transcode=not args.no_stream_transcode,
+                            disk_reserve=args.disk_reserve * 1024 * 1024,
+                            store=ContentStore(root=None) if args.no_dedup else None,
+                            rate_limit=args.limit_rate * 1024 or None, job_rate_limit=args.job_rate * 1024 or None,
+                            make_logger=lambda job: ConsoleLogger(f"[#{job.id}] ", args.verbose))
+    try:
+        if args.metrics_port:
+            engine.tracer.serve(args.metrics_port)
+
+        stream = sys.stdin if args.input == "-" else open(args.input, encoding='utf-8')
+        try:
+            urls = list(read_urls(stream))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        # Metadata parallel olinadi; har bir video tayyor bo'lishi bilan navbatga tushadi
+        playlists = []
+        errors = [0]   # job'ga aylanmagan havolalar (metadata xatosi, playlist ro'yxatini olib bo'lmadi)
+
+        def on_result(url, kind, payload):
+            with print_lock:
+                if kind == "archived":
+                    print(f"Avval yuklangan, o'tkazildi: {url}", file=sys.stderr)
+                elif kind == "duplicate":
+                    print(f"Takroriy havola, o'tkazildi: {url} (= {payload})", file=sys.stderr)
+                elif kind == "error":
+                    errors[0] += 1
+                    print(f"Ma'lumot olishda xato ({url}): {payload}", file=sys.stderr)
+            if kind == "video":
+                engine.submit(url, mode, out_folder, quality, force=args.force)
+            elif kind == "playlist":
+                # Entry'larni sanash tarmoqqa chiqadi — prefetch loop'ini to'xtatmaslik uchun alohida thread'da
+                thread = threading.Thread(target=submit_playlist, args=(payload,), daemon=True)
+                playlists.append(thread)
+                thread.start()
+
+        def submit_playlist(playlist):
+            try:
+                count, skipped = engine.submit_playlist(playlist, mode, out_folder, quality, force=args.force)
+            except Exception as e:
+                with print_lock:
+                    errors[0] += 1
+                    print(f"Playlist {playlist.title}: ro'yxatni olishda xato: {e}", file=sys.stderr)
+                return
+            with print_lock:
+                print(f"Playlist {playlist.title}: {count} ta video, {skipped} tasi avval yuklangan", file=sys.stderr)
+
+        MetadataPrefetcher(engine, on_result, skip_archived=not args.force).start(urls).join()
+        for thread in playlists:
+            thread.join()
+
+        engine.wait()
+        if args.stats:
+            print_stage_stats(engine.tracer, sys.stderr)
+        # Har bir havola yuklangan yoki o'tkazilgan (arxiv, takror) bo'lishi kerak
+        failed = sum(1 for job in engine.jobs.values() if job.state == "failed")
+        return 1 if failed or errors[0] else 0
+    finally:
+        # Umumiy keep-alive ulanishlar (session, RequestDirector'lar) yopiladi
+        engine.http_pool.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,39 +5,212 @@
 
 import tkinter as tk
 from tkinter import ttk, filedialog, scrolledtext, messagebox
-from PIL import Image, ImageTk
-import yt_dlp
 import threading
 import os
 import sys
 import io
-import requests
+import queue
+import hashlib
+from collections import OrderedDict
 import tempfile
 import shutil
 import subprocess
 
+from engine import (
+    DownloadEngine, HttpPool, JobJournal, LogStore, MetadataPrefetcher, PlaylistSource, StageTracer, ProgressAggregator, QUALITY_HEIGHTS, MAX_CONCURRENT_DOWNLOADS,
+    APP_DATA_DIR, video_format_choices, warm_up,
+)
+
+# yt_dlp, PIL va requests oyna chizilgandan keyin kerak bo'lganda import qilinadi
+# (PyInstaller exe'da ular startup'ni bir necha soniyaga sekinlashtiradi)
+
 # ────────────────────────────────────────────────
 # Sozlamalar
 # ────────────────────────────────────────────────
 CURRENT_VERSION = "1.1.0"                    
 GITHUB_REPO = "pmurodxm/yutube-downloader"
 TELEGRAM_CHANNEL = "@CodeDrop_py"
+LOG_FLUSH_INTERVAL = 75                      # log navbati Tk'ga yoziladigan interval (ms)
+LOG_MAX_LINES = 2000                         # log oynasida bir vaqtda turadigan qatorlar
+LOG_PAGE_LINES = 500                         # aylantirganda diskdan bir marta o'qiladigan qatorlar
+PROGRESS_FPS = 10                            # progress GUI'ga sekundiga necha marta chiqariladi
+THUMB_SIZE = (360, 202)
+THUMB_MEMORY_ITEMS = 64                      # xotirada saqlanadigan preview'lar soni
+STATS_REFRESH = 1000                         # statistika oynasi yangilanish intervali (ms)
+# Prometheus /metrics porti (YTD_METRICS_PORT muhit o'zgaruvchisi; berilmasa o'chiq)
+METRICS_PORT = int(os.environ.get("YTD_METRICS_PORT") or 0) or None
+
+# Ro'yxat oynasidagi prefetch natijalari
+PREFETCH_STATES = {
+    "pending":   "Kutilmoqda",
+    "video":     "Tayyor",
+    "playlist":  "Playlist",
+    "duplicate": "Takror",
+    "archived":  "Avval yuklangan",
+    "error":     "Xato",
+    "queued":    "Navbatga qo'shildi",
+}
+
+# Job holatlari va GUI'da ko'rinadigan nomlari
+JOB_STATES = {
+    "queued":          "Navbatda",
+    "extracting":      "Ma'lumot olinmoqda",
+    "waiting":         "Diskda joy kutilmoqda",
+    "downloading":     "Yuklanmoqda",
+    "post-processing": "Qayta ishlanmoqda",
+    "done":            "Tayyor ✓",
+    "failed":          "Xato",
+    "skipped":         "Avval yuklangan",
+}
+
+THUMB_CACHE_DIR = os.path.join(APP_DATA_DIR, "thumbs")
+
+
+# Har bir xabar darhol LogStore'ga (diskka) yoziladi, widget esa faqat oqimning
+# LOG_MAX_LINES qatorlik oynasini ko'rsatadi. Worker thread'lar navbatga yozadi, Tk loop uni
+# timer bilan bo'shatadi. Yuqoriga aylantirilganda eski qatorlar diskdan LOG_PAGE_LINES
+# bo'lib o'qiladi; pastga qaytilganda oyna yana oxirgi qatorlarga ulanadi.
+class LogSink:
+    def __init__(self, text_widget, scrollbar, store, max_lines=LOG_MAX_LINES, page_lines=LOG_PAGE_LINES):
+        self.text = text_widget
+        self.scrollbar = scrollbar
+        self.store = store
+        self.max_lines = max_lines
+        self.page_lines = page_lines
+        self.stream = "all"
+        self.first = self.end = 0        # widget'dagi qatorlar: oqimdagi [first, end)
+        self.follow = True               # yangi qatorlar oxiriga qo'shiladimi
+        self._paging = False
+        self._pending = queue.SimpleQueue()
+        self._write_lock = threading.Lock()
+        self.text.configure(yscrollcommand=self._on_scroll)
+
+    # Qator raqami berilishi va navbatga qo'yilishi bitta lock ostida: aks holda parallel job'lar
+    # xabarlari flush()'ga starts tartibidan boshqacha yetib, skip hisobi qatorlarni tashlab yuboradi
+    def write(self, text, tag=None, job=None):
+        with self._write_lock:
+            starts = self.store.write(text, tag, job)
+            self._pending.put((text, tag, starts))
+
+    def start(self, root, interval=LOG_FLUSH_INTERVAL):
+        def tick():
+            self.flush()
+            root.after(interval, tick)
+        tick()
+
+    def flush(self):
+        chunks = []
+        added = 0
+        while True:
+            try:
+                text, tag, starts = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            start = starts.get(self.stream)
+            if start is None or not self.follow:
+                continue
+            lines = text.rstrip("\n").replace("\r", "").split("\n")
+            # show() diskdan o'qib bo'lgan qatorlar qayta qo'shilmaydi
+            skip = max(0, self.end - start)
+            for line in lines[skip:]:
+                chunks.extend((line + "\n", tag or ()))
+            added += max(0, len(lines) - skip)
+        if not chunks:
+            return
+        self._insert(tk.END, chunks)
+        self.end += added
+        self._trim_top()
+        self.text.see(tk.END)
 
-# Exe rejimida BASE_PATH ni to'g'ri topish
-if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
-    BASE_PATH = sys._MEIPASS
-else:
-    BASE_PATH = os.path.abspath(os.path.dirname(__file__))
+    # Boshqa oqimni (job yoki "all") oxiridan yoki around atrofidan ko'rsatish
+    def show(self, stream="all", around=None):
+        self.stream = str(stream)
+        count = self.store.line_count(self.stream)
+        if around is None:
+            self.end = count
+            self.first = max(self.store.first_line(self.stream), count - self.max_lines)
+        else:
+            self.first = max(self.store.first_line(self.stream), around - self.page_lines // 2)
+            self.end = min(count, self.first + self.page_lines)
+        self.follow = self.end >= count
+        self.text.configure(state='normal')
+        self.text.delete("1.0", tk.END)
+        self.text.configure(state='disabled')
+        self._insert(tk.END, self._rows(self.first, self.end))
+        if around is None:
+            self.text.see(tk.END)
+        else:
+            line = f"{around - self.first + 1}.0"
+            self.text.tag_add("match", line, f"{line} lineend")
+            self.text.see(line)
+
+    def _rows(self, start, end):
+        chunks = []
+        for tag, line in self.store.read(self.stream, start, end):
+            chunks.extend((line + "\n", tag or ()))
+        return chunks
+
+    def _insert(self, index, chunks):
+        if not chunks:
+            return
+        self.text.configure(state='normal')
+        self.text.insert(index, *chunks)
+        self.text.configure(state='disabled')
 
-# ffmpeg yo'li (PyInstaller bilan qo'shilgan bo'lsa)
-FFMPEG_PATH = os.path.join(BASE_PATH, "bin", "ffmpeg.exe")
-if os.path.exists(FFMPEG_PATH):
-    os.environ["FFMPEG_LOCATION"] = FFMPEG_PATH
+    def _trim_top(self):
+        excess = (self.end - self.first) - self.max_lines
+        if excess > 0:
+            self.text.configure(state='normal')
+            self.text.delete("1.0", f"{excess + 1}.0")
+            self.text.configure(state='disabled')
+            self.first += excess
+
+    def _trim_bottom(self):
+        excess = (self.end - self.first) - self.max_lines
+        if excess > 0:
+            self.text.configure(state='normal')
+            self.text.delete(f"end-{excess + 1}l linestart", "end-1c")
+            self.text.configure(state='disabled')
+            self.end -= excess
+            self.follow = False
+
+    def _on_scroll(self, top, bottom):
+        self.scrollbar.set(top, bottom)
+        if self._paging:
+            return
+        if float(top) <= 0.0 and self.first > self.store.first_line(self.stream):
+            self._paging = True
+            self.text.after_idle(self._page_older)
+        elif float(bottom) >= 1.0 and not self.follow:
+            self._paging = True
+            self.text.after_idle(self._page_newer)
+
+    def _page_older(self):
+        start = max(self.store.first_line(self.stream), self.first - self.page_lines)
+        chunks = self._rows(start, self.first)
+        added = len(chunks) // 2
+        self._insert("1.0", chunks)
+        self.first = start
+        self._trim_bottom()
+        # Ko'rinish joyida qoladi: avval tepada turgan qator yana tepada
+        self.text.yview(f"{added + 1}.0")
+        self._paging = False
+
+    def _page_newer(self):
+        count = self.store.line_count(self.stream)
+        end = min(count, self.end + self.page_lines)
+        self._insert(tk.END, self._rows(self.end, end))
+        self.end = end
+        self.follow = self.end >= count
+        self._trim_top()
+        self._paging = False
 
 
 class GuiLogger:
-    def __init__(self, text_widget):
-        self.text = text_widget
+    def __init__(self, sink, prefix="", job=None):
+        self.sink = sink
+        self.prefix = prefix
+        self.job = job
 
     def debug(self, msg):
         if not msg.startswith('[debug] '):
@@ -53,17 +226,87 @@ class GuiLogger:
         self._insert(f"[ERROR] {msg}\n", "error")
 
     def _insert(self, text, tag=None):
-        self.text.configure(state='normal')
-        self.text.insert(tk.END, text, tag)
-        self.text.see(tk.END)
-        self.text.configure(state='disabled')
+        self.sink.write(self.prefix + text, tag, self.job)
+
+
+# Preview'lar: diskda video ID bo'yicha JPEG, xotirada PhotoImage uchun tayyor PPM baytlar (LRU)
+class ThumbnailCache:
+    def __init__(self, http, tracer, cache_dir=THUMB_CACHE_DIR, max_items=THUMB_MEMORY_ITEMS):
+        self.http = http
+        self.tracer = tracer
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, video_id):
+        digest = hashlib.sha1(video_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + ".jpg")
+
+    def get_cached(self, video_id):
+        with self._lock:
+            data = self._memory.get(video_id)
+            if data is not None:
+                self._memory.move_to_end(video_id)
+            return data
+
+    def _remember(self, video_id, data):
+        with self._lock:
+            self._memory[video_id] = data
+            self._memory.move_to_end(video_id)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    # Worker thread'da chaqiriladi: xotira → disk → tarmoq
+    def load(self, video_id, thumb_url):
+        data = self.get_cached(video_id)
+        if data is not None:
+            return data
+
+        from PIL import Image
+
+        path = self._path(video_id)
+        if os.path.exists(path):
+            with Image.open(path) as img:
+                data = self._to_ppm(img.convert("RGB"))
+        else:
+            with self.tracer.span(None, "thumbnail") as span:
+                response = self.http.session().get(thumb_url, timeout=8)
+                response.raise_for_status()
+                span['bytes'] = len(response.content)
+            img = self._decode(response.content)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            img.save(tmp_path, "JPEG", quality=90)
+            os.replace(tmp_path, path)
+            data = self._to_ppm(img)
+
+        self._remember(video_id, data)
+        return data
+
+    @staticmethod
+    def _decode(raw):
+        from PIL import Image
+        img = Image.open(io.BytesIO(raw))
+        # JPEG'ni to'liq o'lchamda ochmasdan, DCT darajasida kichraytiramiz
+        img.draft("RGB", THUMB_SIZE)
+        factor = min(img.width // THUMB_SIZE[0], img.height // THUMB_SIZE[1])
+        if factor >= 2:
+            img = img.reduce(factor)
+        return img.convert("RGB").resize(THUMB_SIZE, Image.Resampling.LANCZOS)
+
+    @staticmethod
+    def _to_ppm(img):
+        buf = io.BytesIO()
+        img.save(buf, "PPM")
+        return buf.getvalue()
 
 
 class YouTubeDownloaderApp:
     def __init__(self, root):
         self.root = root
         self.root.title(f"YouTube Downloader v{CURRENT_VERSION}")
-        self.root.geometry("720x740")
+        self.root.geometry("720x880")
         self.root.resizable(False, False)
         self.root.configure(bg="#1e1e2e")
 
@@ -74,11 +317,37 @@ class YouTubeDownloaderApp:
 
         self._setup_style()
         self.thumbnail_img = None
-        self.download_thread = None
+        # Thumbnail, update tekshiruvi va yt-dlp bitta keep-alive ulanishlar pulidan foydalanadi
+        self.http = HttpPool()
+        self.tracer = StageTracer()
+        if METRICS_PORT:
+            self.tracer.serve(METRICS_PORT)
+        self.thumb_cache = ThumbnailCache(self.http, self.tracer)
+        self._thumb_video_id = None
+        self.progress_agg = ProgressAggregator()
+        self.engine = DownloadEngine(journal=JobJournal(), http_pool=self.http, tracer=self.tracer,
+                                     on_state=self.on_job_state,
+                                     on_progress=self.progress_agg.update,
+                                     make_logger=lambda job: GuiLogger(self.log_sink, f"[#{job.id}] ", job.id))
 
         self.create_widgets()
+        self._progress_tick()
+        # Og'ir ishlar birinchi kadr chizilgandan keyin boshlanadi
+        self.root.after_idle(self._after_first_frame)
+
+    def _after_first_frame(self):
+        threading.Thread(target=warm_up, args=(self.engine.archive,), daemon=True).start()
+        threading.Thread(target=self.resume_unfinished, daemon=True).start()
         self.check_update_on_start()
 
+    def resume_unfinished(self):
+        try:
+            count = self.engine.resume_pending()
+            if count:
+                self.log(f"Oldingi sessiyadan {count} ta tugallanmagan yuklash davom ettirilmoqda", "success")
+        except Exception as e:
+            self.log(f"Job jurnalini o'qib bo'lmadi: {e}", "warning")
+
     def _setup_style(self):
         style = ttk.Style()
         style.theme_use("clam")
@@ -97,6 +366,15 @@ class YouTubeDownloaderApp:
         style.configure("Horizontal.TProgressbar", thickness=24, troughcolor="#2d2d44", background="#a78bfa")
 
     def create_widgets(self):
+        # Menyu
+        menubar = tk.Menu(self.root)
+        archive_menu = tk.Menu(menubar, tearoff=0)
+        archive_menu.add_command(label="Arxivni import qilish (yt-dlp)...", command=self.import_archive)
+        archive_menu.add_command(label="Arxivni eksport qilish...", command=self.export_archive)
+        menubar.add_cascade(label="Arxiv", menu=archive_menu)
+        menubar.add_command(label="Statistika", command=self.show_stats)
+        self.root.config(menu=menubar)
+
         # Header + Telegram info
         header_frame = ttk.Frame(self.root, padding=15)
         header_frame.pack(fill=tk.X)
@@ -109,6 +387,7 @@ class YouTubeDownloaderApp:
         ttk.Label(url_frame, text="YouTube link:", style="Dark.TLabel").pack(side=tk.LEFT, padx=(0, 8))
         self.entry_url = ttk.Entry(url_frame, font=("Segoe UI", 11))
         self.entry_url.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        ttk.Button(url_frame, text="Ro'yxat...", command=self.open_url_list).pack(side=tk.RIGHT, padx=5)
         ttk.Button(url_frame, text="Yuklash", style="Accent.TButton", command=self.start_process).pack(side=tk.RIGHT, padx=5)
 
         # Thumbnail (height va width olib tashlandi, wraplength qo'shildi)
@@ -122,7 +401,43 @@ class YouTubeDownloaderApp:
                                         justify="center")
         self.thumbnail_label.pack()
 
-        # Progress bar + percent
+        # Yuklashlar navbati (har bir job uchun alohida qator)
+        queue_frame = ttk.Frame(self.root, padding=(15, 5))
+        queue_frame.pack(fill=tk.X)
+
+        queue_top = ttk.Frame(queue_frame)
+        queue_top.pack(fill=tk.X, pady=(0, 4))
+        ttk.Label(queue_top, text="Navbat:", style="Dark.TLabel").pack(side=tk.LEFT)
+        self.concurrency_var = tk.IntVar(value=MAX_CONCURRENT_DOWNLOADS)
+        ttk.Spinbox(queue_top, from_=1, to=8, width=4, textvariable=self.concurrency_var,
+                    command=self._on_concurrency_change).pack(side=tk.RIGHT)
+        ttk.Label(queue_top, text="Bir vaqtda:", style="Dark.TLabel").pack(side=tk.RIGHT, padx=5)
+
+        # Tezlik limitlari (KB/s, 0 = cheksiz) — ishlab turgan yuklashlarga darhol ta'sir qiladi
+        self.rate_limit_var = tk.IntVar(value=0)
+        self.job_rate_var = tk.IntVar(value=0)
+        for text, var in (("Umumiy limit KB/s:", self.rate_limit_var), ("Job limiti KB/s:", self.job_rate_var)):
+            ttk.Label(queue_top, text=text, style="Dark.TLabel").pack(side=tk.LEFT, padx=(12, 4))
+            spin = ttk.Spinbox(queue_top, from_=0, to=100000, increment=256, width=7, textvariable=var,
+                               command=self._on_rate_limit_change)
+            spin.pack(side=tk.LEFT)
+            spin.bind("<Return>", lambda e: self._on_rate_limit_change())
+            spin.bind("<FocusOut>", lambda e: self._on_rate_limit_change())
+
+        columns = ("title", "mode", "state", "percent")
+        self.queue_view = ttk.Treeview(queue_frame, columns=columns, show="headings", height=5)
+        self.queue_view.heading("title",   text="Video")
+        self.queue_view.heading("mode",    text="Turi")
+        self.queue_view.heading("state",   text="Holat")
+        self.queue_view.heading("percent", text="Foiz")
+        self.queue_view.column("title",   width=370)
+        self.queue_view.column("mode",    width=80,  anchor=tk.CENTER)
+        self.queue_view.column("state",   width=140, anchor=tk.CENTER)
+        self.queue_view.column("percent", width=70,  anchor=tk.CENTER)
+        self.queue_view.pack(fill=tk.X)
+        self.queue_view.bind("<<TreeviewSelect>>", lambda e: self._on_job_select())
+
+        # Progress bar + percent (navbatda tanlangan job uchun)
         self.progress = ttk.Progressbar(self.root, orient="horizontal", length=660, mode="determinate")
         self.progress.pack(pady=(5, 5))
         self.percent_label = ttk.Label(self.root, text="0%", style="Percent.TLabel")
@@ -131,8 +446,20 @@ class YouTubeDownloaderApp:
         # Log oynasi
         log_frame = ttk.Frame(self.root, padding=(15, 5))
         log_frame.pack(fill=tk.BOTH, expand=True)
-        
-        self.log_text = scrolledtext.ScrolledText(log_frame, height=8, state='disabled',
+
+        # Log qidiruvi va faqat tanlangan job loglarini ko'rsatish
+        log_bar = ttk.Frame(log_frame)
+        log_bar.pack(fill=tk.X, pady=(0, 4))
+        self.log_job_only_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(log_bar, text="Faqat tanlangan job", variable=self.log_job_only_var,
+                        command=self._show_log_stream).pack(side=tk.LEFT)
+        ttk.Button(log_bar, text="Qidirish", command=self.search_log).pack(side=tk.RIGHT)
+        self.log_search_entry = ttk.Entry(log_bar, width=24)
+        self.log_search_entry.pack(side=tk.RIGHT, padx=5)
+        self.log_search_entry.bind("<Return>", lambda e: self.search_log())
+        self._log_search = None          # (oqim, so'z, oxirgi topilgan qator)
+
+        self.log_text = scrolledtext.ScrolledText(log_frame, height=7, state='disabled',
                                                   font=("Consolas", 9), bg="#111827", fg="#d1d5db",
                                                   insertbackground="white")
         self.log_text.pack(fill=tk.BOTH, expand=True)
@@ -142,6 +469,11 @@ class YouTubeDownloaderApp:
         self.log_text.tag_config("success", foreground="#6ee7b7")
         self.log_text.tag_config("info",    foreground="#93c5fd")
 
+        self.log_text.tag_config("match",   background="#7c3aed", foreground="white")
+
+        self.log_sink = LogSink(self.log_text, self.log_text.vbar, LogStore())
+        self.log_sink.start(self.root)
+
         # Status bar
         self.status_var = tk.StringVar(value="Havolani kiriting va Yuklash tugmasini bosing")
         status = ttk.Label(self.root, 
@@ -151,31 +483,123 @@ class YouTubeDownloaderApp:
                            padding=8)
         status.pack(side=tk.BOTTOM, fill=tk.X)
 
-    def log(self, msg, tag="info"):
-        self.log_text.configure(state='normal')
-        self.log_text.insert(tk.END, msg + "\n", tag)
-        self.log_text.see(tk.END)
-        self.log_text.configure(state='disabled')
+    def import_archive(self):
+        path = filedialog.askopenfilename(title="yt-dlp arxiv fayli", filetypes=[("Matn fayli", "*.txt"), ("Barchasi", "*.*")])
+        if not path:
+            return
+        try:
+            added = self.engine.archive.import_file(path)
+            self.log(f"Arxivga {added} ta yangi yozuv qo'shildi (jami {len(self.engine.archive)})", "success")
+        except Exception as e:
+            messagebox.showerror("Xato", f"Arxivni o'qib bo'lmadi: {e}")
 
-    def update_progress(self, percent):
+    def export_archive(self):
+        path = filedialog.asksaveasfilename(title="Arxivni saqlash", defaultextension=".txt",
+                                            initialfile="archive.txt", filetypes=[("Matn fayli", "*.txt")])
+        if not path:
+            return
         try:
-            p = float(percent.strip('%').replace(',', '.'))
-            self.progress['value'] = p
-            self.percent_label.config(text=f"{percent.strip()}")
-            self.root.update_idletasks()
-        except:
-            pass
+            count = self.engine.archive.export_file(path)
+            self.log(f"Arxiv eksport qilindi: {count} ta yozuv → {path}", "success")
+        except Exception as e:
+            messagebox.showerror("Xato", f"Arxivni saqlab bo'lmadi: {e}")
 
-    def show_thumbnail(self, thumb_url):
+    # Bosqichlar bo'yicha p50/p95 va transfer tezligi gistogrammasi (StageTracer'dan)
+    def show_stats(self):
+        win = tk.Toplevel(self.root)
+        win.title("Statistika")
+        win.geometry("560x480")
+        win.configure(bg="#1e1e2e")
+        win.transient(self.root)
+
+        ttk.Label(win, text="Bosqichlar", style="Header.TLabel").pack(pady=(15, 8))
+        columns = ("stage", "count", "errors", "p50", "p95", "size")
+        view = ttk.Treeview(win, columns=columns, show="headings", height=8)
+        for col, text, width in (("stage", "Bosqich", 120), ("count", "Soni", 60), ("errors", "Xato", 60),
+                                 ("p50", "p50", 90), ("p95", "p95", 90), ("size", "Hajm", 100)):
+            view.heading(col, text=text)
+            view.column(col, width=width, anchor=tk.W if col == "stage" else tk.CENTER)
+        view.pack(padx=15, fill=tk.X)
+
+        ttk.Label(win, text="Transfer tezligi (MiB/s)", style="Dark.TLabel").pack(pady=(12, 4))
+        canvas = tk.Canvas(win, width=520, height=170, bg="#111827", highlightthickness=0)
+        canvas.pack(padx=15)
+
+        def refresh():
+            if not win.winfo_exists():
+                return
+            view.delete(*view.get_children())
+            for stage, s in self.tracer.stats().items():
+                view.insert("", tk.END, values=(stage, s['count'], s['errors'], f"{s['p50']:.3f} s",
+                                                f"{s['p95']:.3f} s", f"{s['bytes'] / (1024 * 1024):.1f} MB"))
+            self._draw_histogram(canvas, self.tracer.throughput_histogram())
+            win.after(STATS_REFRESH, refresh)
+
+        refresh()
+
+    @staticmethod
+    def _draw_histogram(canvas, buckets):
+        canvas.delete("all")
+        width, height = int(canvas["width"]), int(canvas["height"])
+        top = max((count for _, count in buckets), default=0) or 1
+        slot = width / len(buckets)
+        for i, (bound, count) in enumerate(buckets):
+            x0 = i * slot + 6
+            bar = (height - 40) * count / top
+            canvas.create_rectangle(x0, height - 22 - bar, x0 + slot - 12, height - 22, fill="#a78bfa", width=0)
+            if count:
+                canvas.create_text(x0 + (slot - 12) / 2, height - 30 - bar, text=str(count), fill="#e0e0ff")
+            label = f"≤{bound:g}" if bound is not None else f">{buckets[i - 1][0]:g}"
+            canvas.create_text(x0 + (slot - 12) / 2, height - 10, text=label, fill="#9ca3af", font=("Segoe UI", 8))
+
+    def log(self, msg, tag="info", job=None):
+        self.log_sink.write(msg + "\n", tag, job.id if job is not None else None)
+
+    def _show_log_stream(self):
+        job = self._selected_job() if self.log_job_only_var.get() else None
+        stream = str(job.id) if job is not None else "all"
+        if stream != self.log_sink.stream:
+            self._log_search = None
+            self.log_sink.show(stream)
+
+    # Har bosishda oldingi (eskiroq) moslikka o'tadi; qidiruv diskdagi butun log bo'yicha
+    def search_log(self):
+        needle = self.log_search_entry.get().strip()
+        if not needle:
+            return
+        stream = self.log_sink.stream
+        before = None
+        if self._log_search and self._log_search[:2] == (stream, needle):
+            before = self._log_search[2]
+
+        def work():
+            found = self.log_sink.store.search(stream, needle, before)
+            self.root.after(0, show, found)
+
+        def show(found):
+            if found is None:
+                self.status_var.set(f"Logda topilmadi: {needle}")
+                self._log_search = None
+                return
+            self._log_search = (stream, needle, found)
+            self.log_sink.show(stream, around=found)
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def load_thumbnail(self, video_id, thumb_url):
         try:
-            response = requests.get(thumb_url, timeout=8)
-            response.raise_for_status()
-            img = Image.open(io.BytesIO(response.content))
-            img = img.resize((360, 202), Image.Resampling.LANCZOS)
-            self.thumbnail_img = ImageTk.PhotoImage(img)
-            self.thumbnail_label.config(image=self.thumbnail_img, text="")
+            data = self.thumb_cache.load(video_id, thumb_url)
+            self.root.after(0, self.show_thumbnail, video_id, data)
         except Exception as e:
-            self.thumbnail_label.config(text=f"Preview yuklanmadi\n({str(e)})")
+            err = str(e)
+            self.root.after(0, lambda: self.thumbnail_label.config(text=f"Preview yuklanmadi\n({err})"))
+
+    def show_thumbnail(self, video_id, data):
+        # Foydalanuvchi boshqa havolaga o'tgan bo'lsa eski preview'ni ko'rsatmaymiz
+        if video_id != self._thumb_video_id:
+            return
+        self.thumbnail_img = tk.PhotoImage(data=data)
+        self.thumbnail_label.config(image=self.thumbnail_img, text="")
 
     def start_process(self):
         url = self.entry_url.get().strip()
@@ -185,31 +609,209 @@ class YouTubeDownloaderApp:
 
         self.log("Havola qabul qilindi → " + url, "success")
         self.status_var.set("Ma'lumot olinmoqda...")
-        self.progress['value'] = 0
-        self.percent_label.config(text="0%")
-        self.thumbnail_label.config(image='', text="Preview yuklanmoqda...")
+        self._thumb_video_id = None
+        info = self.engine.info_cache.peek(url)
+        cached = self.thumb_cache.get_cached(info['id']) if info and info.get('id') else None
+        if cached is not None:
+            self._thumb_video_id = info['id']
+            self.show_thumbnail(info['id'], cached)
+        else:
+            self.thumbnail_label.config(image='', text="Preview yuklanmoqda...")
 
         threading.Thread(target=self.fetch_info_and_thumb, args=(url,), daemon=True).start()
 
-    def fetch_info_and_thumb(self, url):
+    def fetch_info_and_thumb(self, url, force=False):
+        # Arxivda bor bo'lsa tarmoqqa chiqishdan oldin to'xtaymiz
+        if not force and self.engine.is_archived(url):
+            self.root.after(0, self._confirm_redownload, url)
+            return
+
         try:
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-                info = ydl.extract_info(url, download=False)
-                thumb_url = info.get('thumbnail') or (info.get('thumbnails') or [{}])[0].get('url', '')
-                if thumb_url:
-                    self.root.after(0, self.show_thumbnail, thumb_url)
-                else:
-                    self.root.after(0, lambda: self.thumbnail_label.config(text="Rasm topilmadi"))
+            result = self.engine.fetch_info(url)
+            if isinstance(result, PlaylistSource):
+                self._thumb_video_id = None
+                self.root.after(0, lambda: [
+                    self.thumbnail_label.config(image='', text=f"Playlist: {result.title}"),
+                    self.ask_format(url, result)
+                ])
+                return
+
+            video_id = result.get('id') or url
+            thumb_url = result.get('thumbnail') or (result.get('thumbnails') or [{}])[0].get('url', '')
+            self._thumb_video_id = video_id
+            if thumb_url:
+                threading.Thread(target=self.load_thumbnail, args=(video_id, thumb_url), daemon=True).start()
+            else:
+                self.root.after(0, lambda: self.thumbnail_label.config(text="Rasm topilmadi"))
 
             self.root.after(0, lambda: self.ask_format(url))
         except Exception as e:
+            err = str(e)
             self.root.after(0, lambda: [
-                self.log(f"Ma'lumot olishda xato: {str(e)}", "error"),
+                self.log(f"Ma'lumot olishda xato: {err}", "error"),
                 self.thumbnail_label.config(text="Video ma'lumotlari olinmadi"),
                 self.status_var.set("Xatolik yuz berdi")
             ])
 
-    def ask_format(self, url):
+    # ────────────────────────────────────────────────
+    # Havolalar ro'yxati: metadata va preview'lar parallel olinadi (MetadataPrefetcher),
+    # tayyor bo'lgan qatorlarni qolganlarini kutmasdan navbatga qo'shish mumkin
+    # ────────────────────────────────────────────────
+    def open_url_list(self):
+        win = tk.Toplevel(self.root)
+        win.title("Havolalar ro'yxati")
+        win.geometry("680x620")
+        win.configure(bg="#1e1e2e")
+        win.transient(self.root)
+
+        ttk.Label(win, text="Havolalar (har qatorda bitta):", style="Dark.TLabel").pack(anchor="w", padx=15, pady=(15, 4))
+        text = scrolledtext.ScrolledText(win, height=6, font=("Consolas", 9), bg="#111827", fg="#d1d5db",
+                                         insertbackground="white")
+        text.pack(fill=tk.X, padx=15)
+        try:
+            clipboard = self.root.clipboard_get()
+        except tk.TclError:
+            clipboard = ""
+        if any(line.strip().startswith(("http://", "https://")) for line in clipboard.splitlines()):
+            text.insert("1.0", clipboard.strip() + "\n")
+
+        def load_file():
+            path = filedialog.askopenfilename(parent=win, title="Havolalar fayli",
+                                              filetypes=[("Matn fayli", "*.txt"), ("Barchasi", "*.*")])
+            if path:
+                with open(path, encoding='utf-8', errors='replace') as f:
+                    text.insert(tk.END, f.read().strip() + "\n")
+
+        actions = ttk.Frame(win, padding=(15, 6))
+        actions.pack(fill=tk.X)
+        ttk.Button(actions, text="Fayldan...", command=load_file).pack(side=tk.LEFT)
+        fetch_button = ttk.Button(actions, text="Ma'lumot olish", style="Accent.TButton")
+        fetch_button.pack(side=tk.LEFT, padx=8)
+        counter = tk.StringVar(value="")
+        ttk.Label(actions, textvariable=counter, style="Dark.TLabel").pack(side=tk.RIGHT)
+
+        columns = ("title", "duration", "state")
+        view = ttk.Treeview(win, columns=columns, show="headings", height=12, selectmode="extended")
+        view.heading("title", text="Video")
+        view.heading("duration", text="Davomiyligi")
+        view.heading("state", text="Holat")
+        view.column("title", width=420)
+        view.column("duration", width=90, anchor=tk.CENTER)
+        view.column("state", width=130, anchor=tk.CENTER)
+        view.pack(fill=tk.BOTH, expand=True, padx=15)
+
+        bottom = ttk.Frame(win, padding=15)
+        bottom.pack(fill=tk.X)
+        mode_var = tk.StringVar(value="Video")
+        quality_var = tk.StringVar(value="720p")
+        ttk.Combobox(bottom, textvariable=mode_var, values=("Video", "Audio"), state="readonly", width=8).pack(side=tk.LEFT)
+        ttk.Combobox(bottom, textvariable=quality_var, values=list(QUALITY_HEIGHTS), state="readonly",
+                     width=16).pack(side=tk.LEFT, padx=8)
+        ttk.Button(bottom, text="Hammasini tanlash",
+                   command=lambda: view.selection_set(view.get_children())).pack(side=tk.LEFT)
+        ttk.Button(bottom, text="Navbatga qo'shish", style="Accent.TButton",
+                   command=lambda: queue_selected()).pack(side=tk.RIGHT)
+
+        rows = {}            # iid → {'url', 'kind', 'payload'}
+        prefetcher = [None]
+        generation = [0]     # qayta boshlanganda eski prefetcher natijalari tashlab yuboriladi
+
+        def start():
+            urls = [line.strip() for line in text.get("1.0", tk.END).splitlines()
+                    if line.strip() and not line.strip().startswith('#')]
+            if not urls:
+                return
+            if prefetcher[0] is not None:
+                prefetcher[0].cancel()
+            view.delete(*view.get_children())
+            rows.clear()
+            for i, url in enumerate(urls):
+                rows[str(i)] = {'url': url, 'kind': "pending", 'payload': None}
+                view.insert("", tk.END, iid=str(i), values=(url, "", PREFETCH_STATES["pending"]))
+            # Bir xil havola bir necha marta bo'lsa, natija kelgan qator tartib bo'yicha topiladi
+            waiting = {}
+            for iid, row in rows.items():
+                waiting.setdefault(row['url'], []).append(iid)
+            counter.set(f"0/{len(urls)}")
+            generation[0] += 1
+            current = generation[0]
+
+            def on_result(url, kind, payload):
+                self.root.after(0, show_result, current, waiting[url].pop(0), kind, payload)
+
+            prefetcher[0] = MetadataPrefetcher(self.engine, on_result, after_fetch=self._prefetch_thumbnail)
+            prefetcher[0].start(urls)
+
+        def show_result(current, iid, kind, payload):
+            if current != generation[0] or not win.winfo_exists():
+                return
+            row = rows[iid]
+            row.update(kind=kind, payload=payload)
+            title, duration = row['url'], ""
+            if kind == "video":
+                title = payload.get('title') or title
+                duration = payload.get('duration_string') or ""
+            elif kind == "playlist":
+                title = f"Playlist: {payload.title}"
+            elif kind == "error":
+                title = f"{row['url']} — {payload}"
+            view.item(iid, values=(title, duration, PREFETCH_STATES[kind]))
+            done = sum(1 for r in rows.values() if r['kind'] != "pending")
+            counter.set(f"{done}/{len(rows)}")
+
+        def on_select():
+            # Tanlangan videoning preview'i (prefetch keshga yuklagan bo'lsa) asosiy oynada ko'rinadi
+            selection = view.selection()
+            row = rows.get(selection[0]) if selection else None
+            if row and row['kind'] == "video" and row['payload'].get('id'):
+                video_id = row['payload']['id']
+                cached = self.thumb_cache.get_cached(video_id)
+                self._thumb_video_id = video_id
+                if cached is not None:
+                    self.show_thumbnail(video_id, cached)
+
+        def queue_selected():
+            ready = [iid for iid in view.selection() if rows[iid]['kind'] in ("video", "playlist")]
+            if not ready:
+                return
+            mode = "video" if mode_var.get() == "Video" else "audio"
+            quality = quality_var.get() if mode == "video" else None
+            folder = filedialog.askdirectory(parent=win, title="Saqlash joyi")
+            if not folder:
+                return
+            for iid in ready:
+                row = rows[iid]
+                if row['kind'] == "playlist":
+                    self.start_batch(row['payload'], mode, folder, quality)
+                else:
+                    self.start_download(row['url'], mode, folder, quality)
+                row['kind'] = "queued"
+                view.set(iid, "state", PREFETCH_STATES["queued"])
+
+        def close():
+            if prefetcher[0] is not None:
+                prefetcher[0].cancel()
+            win.destroy()
+
+        fetch_button.configure(command=start)
+        view.bind("<<TreeviewSelect>>", lambda e: on_select())
+        win.protocol("WM_DELETE_WINDOW", close)
+
+    # Prefetcher'ning executor thread'ida: preview diskka va xotiraga oldindan yuklanadi
+    def _prefetch_thumbnail(self, url, info):
+        thumb_url = info.get('thumbnail') or (info.get('thumbnails') or [{}])[0].get('url')
+        if info.get('id') and thumb_url:
+            self.thumb_cache.load(info['id'], thumb_url)
+
+    def _confirm_redownload(self, url):
+        self.status_var.set("Bu video avval yuklangan")
+        if messagebox.askyesno("Avval yuklangan", "Bu video arxivda bor (avval yuklangan).\n\nBaribir qayta yuklaymizmi?"):
+            self.status_var.set("Ma'lumot olinmoqda...")
+            threading.Thread(target=self.fetch_info_and_thumb, args=(url, True), daemon=True).start()
+        else:
+            self.thumbnail_label.config(image='', text="Avval yuklangan")
+
+    def ask_format(self, url, playlist=None):
         win = tk.Toplevel(self.root)
         win.title("Nima yuklaymiz?")
         win.geometry("440x280")
@@ -217,20 +819,29 @@ class YouTubeDownloaderApp:
         win.transient(self.root)
         win.grab_set()
 
-        ttk.Label(win, text="Tanlang:", style="Header.TLabel").pack(pady=20)
+        ttk.Label(win, text="Tanlang:", style="Header.TLabel").pack(pady=(20, 5) if playlist else 20)
+        if playlist:
+            ttk.Label(win, text=f"Playlist: {playlist.title}", style="Dark.TLabel").pack()
 
         btn_frame = ttk.Frame(win)
         btn_frame.pack(pady=10)
 
         ttk.Button(btn_frame, text="🎥 Video (mp4)", style="Accent.TButton", width=25,
-                   command=lambda: [win.destroy(), self.ask_video_quality(url)]).pack(pady=10)
+                   command=lambda: [win.destroy(), self.ask_video_quality(url, playlist)]).pack(pady=10)
 
         ttk.Button(btn_frame, text="🎵 Audio (mp3)", style="Accent.TButton", width=25,
-                   command=lambda: [win.destroy(), self.ask_folder_and_download(url, "audio", None)]).pack(pady=10)
+                   command=lambda: [win.destroy(), self.ask_folder_and_download(url, "audio", None, playlist)]).pack(pady=10)
 
         ttk.Button(btn_frame, text="Bekor qilish", command=win.destroy).pack(pady=10)
 
-    def ask_video_quality(self, url):
+    def ask_video_quality(self, url, playlist=None):
+        # Bitta video uchun ro'yxat haqiqiy info['formats'] dan quriladi
+        info = None if playlist else self.engine.info_cache.peek(url)
+        choices = video_format_choices(info) if info else []
+        if choices:
+            self.ask_video_format(url, choices)
+            return
+
         win = tk.Toplevel(self.root)
         win.title("Sifatni tanlang")
         win.geometry("440x340")
@@ -240,7 +851,7 @@ class YouTubeDownloaderApp:
 
         ttk.Label(win, text="Video sifati:", style="Header.TLabel").pack(pady=20)
 
-        qualities = ["360p", "480p", "720p", "1080p", "Eng yuqori sifat"]
+        qualities = list(QUALITY_HEIGHTS)
         self.selected_quality = tk.StringVar(value="720p")
 
         for q in qualities:
@@ -248,12 +859,54 @@ class YouTubeDownloaderApp:
 
         def confirm():
             win.destroy()
-            self.ask_folder_and_download(url, "video", self.selected_quality.get())
+            self.ask_folder_and_download(url, "video", self.selected_quality.get(), playlist)
 
         ttk.Button(win, text="Davom etish", style="Accent.TButton", command=confirm).pack(pady=25)
         ttk.Button(win, text="Orqaga", command=win.destroy).pack()
 
-    def ask_folder_and_download(self, url, mode, quality=None):
+    def ask_video_format(self, url, choices):
+        win = tk.Toplevel(self.root)
+        win.title("Formatni tanlang")
+        win.geometry("560x440")
+        win.configure(bg="#1e1e2e")
+        win.transient(self.root)
+        win.grab_set()
+
+        ttk.Label(win, text="Video formati:", style="Header.TLabel").pack(pady=(20, 10))
+
+        columns = ("quality", "codec", "ext", "fps", "size")
+        view = ttk.Treeview(win, columns=columns, show="headings", height=10, selectmode="browse")
+        for col, text, width in (("quality", "Sifat", 110), ("codec", "Kodek", 100), ("ext", "Format", 80),
+                                 ("fps", "FPS", 70), ("size", "Hajmi", 120)):
+            view.heading(col, text=text)
+            view.column(col, width=width, anchor=tk.CENTER)
+        for i, c in enumerate(choices):
+            view.insert("", tk.END, iid=str(i), values=(c['label'], c['codec'], c['ext'] or "?",
+                                                        c['fps'] or "?", self._format_size(c['size'])))
+        view.pack(padx=20, fill=tk.X)
+        view.selection_set("0")
+
+        def confirm():
+            selection = view.selection()
+            if not selection:
+                return
+            choice = choices[int(selection[0])]
+            win.destroy()
+            self.ask_folder_and_download(url, "video", choice['quality'], format_id=choice['format_id'])
+
+        view.bind("<Double-1>", lambda e: confirm())
+        ttk.Button(win, text="Davom etish", style="Accent.TButton", command=confirm).pack(pady=(20, 10))
+        ttk.Button(win, text="Orqaga", command=win.destroy).pack()
+
+    @staticmethod
+    def _format_size(size):
+        if not size:
+            return "?"
+        if size >= 1024 ** 3:
+            return f"~{size / 1024 ** 3:.2f} GB"
+        return f"~{size / 1024 ** 2:.1f} MB"
+
+    def ask_folder_and_download(self, url, mode, quality=None, playlist=None, format_id=None):
         title = "Videoni saqlash joyi" if mode == "video" else "Audioni saqlash joyi"
         folder = filedialog.askdirectory(title=title)
         if not folder:
@@ -261,77 +914,117 @@ class YouTubeDownloaderApp:
             self.status_var.set("Bekor qilindi")
             return
 
-        self.start_download(url, mode, folder, quality)
+        if playlist:
+            self.start_batch(playlist, mode, folder, quality)
+        else:
+            self.start_download(url, mode, folder, quality, format_id)
 
-    def start_download(self, url, mode, out_folder, quality):
-        if self.download_thread and self.download_thread.is_alive():
-            self.log("Yuklash allaqachon davom etmoqda...", "warning")
-            return
+    def start_batch(self, playlist, mode, out_folder, quality):
+        self.log(f"→ Playlist: {playlist.title} — videolar navbatga qo'shilmoqda...", "success")
+        threading.Thread(target=self.batch_task, args=(playlist, mode, out_folder, quality), daemon=True).start()
 
-        self.log_text.configure(state='normal')
-        self.log_text.delete("1.0", tk.END)
-        self.log_text.configure(state='disabled')
+    def batch_task(self, playlist, mode, out_folder, quality):
+        try:
+            # Har bir entry topilishi bilan navbatga tushadi
+            count, skipped = self.engine.submit_playlist(playlist, mode, out_folder, quality)
+            self.log(f"Playlist ro'yxati tugadi: {count} ta video, {skipped} tasi avval yuklangan", "success")
+        except Exception as e:
+            self.log(f"Playlist ro'yxatini olishda xato: {e}", "error")
+
+    def start_download(self, url, mode, out_folder, quality, format_id=None):
+        # Arxiv havola olinganda tekshirilgan (yoki foydalanuvchi qayta yuklashni tasdiqlagan)
+        job = self.engine.submit(url, mode, out_folder, quality, format_id=format_id, force=True)
+        self.refresh_job(job)
+        self.queue_view.selection_set(str(job.id))
+        self.queue_view.see(str(job.id))
 
-        self.log(f"→ Yuklash boshlandi ({mode.upper()})", "success")
+        self.log(f"→ #{job.id} navbatga qo'shildi ({mode.upper()})", "success", job)
         if quality:
-            self.log(f"Sifat: {quality}", "info")
-        self.status_var.set("Yuklanmoqda...")
+            self.log(f"Sifat: {quality}", "info", job)
 
-        self.download_thread = threading.Thread(
-            target=self.download_task,
-            args=(url, mode, out_folder, quality),
-            daemon=True
-        )
-        self.download_thread.start()
+    def _on_concurrency_change(self):
+        try:
+            self.engine.set_max_workers(self.concurrency_var.get())
+        except (tk.TclError, ValueError):
+            pass
 
-    def download_task(self, url, mode, out_folder, quality):
+    def _on_rate_limit_change(self):
         try:
-            logger = GuiLogger(self.log_text)
-
-            if mode == "video":
-                height_map = {"360p": 360, "480p": 480, "720p": 720, "1080p": 1080, "Eng yuqori sifat": None}
-                max_h = height_map.get(quality)
-                fmt = f'bestvideo[height<={max_h}][ext=mp4]+bestaudio[ext=m4a]/best' if max_h else 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best'
-                ydl_opts = {
-                    'format': fmt,
-                    'outtmpl': os.path.join(out_folder, '%(title)s.%(ext)s'),
-                    'merge_output_format': 'mp4',
-                    'noplaylist': True,
-                }
-            else:
-                ydl_opts = {
-                    'format': 'bestaudio/best',
-                    'outtmpl': os.path.join(out_folder, '%(title)s.%(ext)s'),
-                    'postprocessors': [{
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': 'mp3',
-                        'preferredquality': '192',
-                    }],
-                }
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.add_progress_hook(self.my_hook)
-                ydl.params['logger'] = logger
-                ydl.download([url])
+            self.engine.set_bandwidth(max(0, self.rate_limit_var.get()) * 1024,
+                                      max(0, self.job_rate_var.get()) * 1024)
+        except (tk.TclError, ValueError):
+            pass
 
-            self.root.after(0, lambda: [
-                self.log("\n✅ Yuklash muvaffaqiyatli yakunlandi!", "success"),
-                self.status_var.set("Tayyor ✓"),
-                self.update_progress("100%")
-            ])
+    def _on_job_select(self):
+        # Kuzatilayotgan job tarmoqdan kattaroq ulush oladi
+        self.engine.set_focus(self._selected_job())
+        self._show_selected_job()
+        self._show_log_stream()
 
-        except Exception as e:
-            self.root.after(0, lambda: [
-                self.log(f"\n❌ Xato: {str(e)}", "error"),
-                self.status_var.set("Xatolik yuz berdi")
-            ])
+    def _job_row(self, job):
+        mode = "Video" if job.mode == "video" else "Audio"
+        if job.quality:
+            mode += f" {job.quality}"
+        return (job.title, mode, JOB_STATES[job.state], f"{job.percent:.1f}%")
 
-    def my_hook(self, d):
-        if d['status'] == 'downloading':
-            percent = d.get('_percent_str', '0%')
-            self.root.after(0, self.update_progress, percent)
-        elif d['status'] == 'finished':
-            self.root.after(0, lambda: self.log("Fayl yuklandi → post-processing...", "success"))
+    def publish_progress(self, job, downloaded, total):
+        if job.finished:
+            return
+        if total:
+            job.percent = min(100.0, downloaded * 100.0 / total)
+        self.refresh_job(job)
+
+    def _progress_tick(self):
+        for job, (downloaded, total) in self.progress_agg.drain().items():
+            self.publish_progress(job, downloaded, total)
+        self.root.after(max(1, int(1000 / PROGRESS_FPS)), self._progress_tick)
+
+    # Engine callback'i: istalgan worker thread'dan chaqiriladi
+    def on_job_state(self, job):
+        if job.state == "post-processing":
+            self.log(f"#{job.id} fayl yuklandi → post-processing...", "success", job)
+        elif job.state == "done" and job.reused:
+            self.log(f"✅ #{job.id} avval yuklangan nusxadan olindi ({job.reused}): {job.output_path}", "success", job)
+        elif job.state == "done":
+            self.log(f"✅ #{job.id} muvaffaqiyatli yakunlandi!", "success", job)
+        elif job.state == "failed":
+            self.log(f"❌ #{job.id} xato: {job.error}", "error", job)
+        elif job.state == "skipped":
+            self.log(f"#{job.id} avval yuklangan, o'tkazib yuborildi", "warning", job)
+        self.root.after(0, self.refresh_job, job)
+
+    def _selected_job(self):
+        selection = self.queue_view.selection()
+        if selection:
+            return self.engine.jobs.get(int(selection[0]))
+        return None
+
+    def refresh_job(self, job):
+        if self.queue_view.exists(str(job.id)):
+            self.queue_view.item(str(job.id), values=self._job_row(job))
+        else:
+            self.queue_view.insert("", tk.END, iid=str(job.id), values=self._job_row(job))
+        if job is self._selected_job():
+            self._show_selected_job()
+        self._update_status()
+
+    def _show_selected_job(self):
+        job = self._selected_job()
+        if job is None:
+            return
+        self.progress['value'] = job.percent
+        self.percent_label.config(text=f"{job.percent:.1f}%")
+
+    def _update_status(self):
+        jobs = list(self.engine.jobs.values())
+        active = sum(1 for j in jobs if j.state != "queued" and not j.finished)
+        waiting = sum(1 for j in jobs if j.state == "queued")
+        if active or waiting:
+            self.status_var.set(f"Yuklanmoqda: {active} ta, navbatda: {waiting} ta")
+        elif any(j.state == "failed" for j in jobs):
+            self.status_var.set("Navbat tugadi (xatoliklar bor)")
+        else:
+            self.status_var.set("Tayyor ✓")
 
     # ────────────────────────────────────────────────
     # Auto-update funksiyalari
@@ -341,7 +1034,7 @@ class YouTubeDownloaderApp:
 
     def _check_for_update(self):
         try:
-            response = requests.get(f"https://api.github.com/repos/{GITHUB_REPO}/releases/latest", timeout=10)
+            response = self.http.session().get(f"https://api.github.com/repos/{GITHUB_REPO}/releases/latest", timeout=10)
             response.raise_for_status()
             data = response.json()
             latest_tag = data['tag_name'].lstrip('v')
@@ -372,7 +1065,7 @@ class YouTubeDownloaderApp:
 
             self.log("Yangilanish yuklanmoqda...", "info")
 
-            with requests.get(download_url, stream=True) as r:
+            with self.http.session().get(download_url, stream=True, timeout=30) as r:
                 r.raise_for_status()
                 with open(new_exe, 'wb') as f:
                     shutil.copyfileobj(r.raw, f)
@@ -400,4 +1093,8 @@ del "%~f0"
 if __name__ == "__main__":
     root = tk.Tk()
     app = YouTubeDownloaderApp(root)
-    root.mainloop()
+    try:
+        root.mainloop()
+    finally:
+        # Oyna yopildi (yoki yangilash uchun quit()) — umumiy keep-alive ulanishlar yopiladi
+        app.http.close()
@@ -0,0 +1,367 @@
+# segmented.py
+# Progressive (bitta URL, uzunligi ma'lum) formatlarni bir nechta ulanish orqali
+# bo'laklab yuklash. YouTube har bir ulanish tezligini cheklaydi, shuning uchun
+# bir nechta Range so'rovi parallel yuborilsa umumiy tezlik oshadi.
+# bestvideo+bestaudio tanlovlarida video va audio stream'lar ham bir vaqtda yuklanadi.
+#
+# engine.py buni faqat load_downloader() orqali, kerak bo'lganda import qiladi (yt_dlp og'ir).
+
+import os
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
+
+import yt_dlp
+from yt_dlp.downloader.common import FileDownloader
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking import Request
+from yt_dlp.utils import determine_protocol
+
+from engine import SEGMENT_CONNECTIONS, SEGMENT_CHUNK_SIZE
+from transcode import StreamingTranscodeFD, StreamedAudioPP, output_path
+from writer import OutputWriter
+
+SEGMENT_RETRIES = 3
+READ_BLOCK = 64 * 1024
+PROGRESS_INTERVAL = 0.2                      # progress hook'lar orasidagi vaqt (soniya)
+PARALLEL_STREAMS = 2                         # oxirgisidan tashqari bir vaqtda yuklanadigan stream'lar
+
+
+# Bo'laklar writer.OutputWriter orqali oldindan ajratilgan faylga pwrite bilan yoziladi.
+# 'output_consumers' berilsa — callable(filename, info) → iste'molchilar ro'yxati: har biri
+# faylning tayyor qismini boshidan tartib bilan memoryview sifatida oladi (masalan hash).
+class SegmentedFD(FileDownloader):
+    FD_NAME = 'segmented'
+
+    @staticmethod
+    def can_download(info, params):
+        opts = params.get('segmented') or {}
+        if opts.get('connections', 1) < 2:
+            return False
+        if info.get('fragments') or info.get('requested_formats'):
+            return False
+        return (info.get('protocol') or determine_protocol(info)) in ('http', 'https')
+
+    def real_download(self, filename, info_dict):
+        opts = self.params.get('segmented') or {}
+        connections = opts.get('connections', SEGMENT_CONNECTIONS)
+        chunk_size = opts.get('chunk_size', SEGMENT_CHUNK_SIZE)
+        url = info_dict['url']
+        headers = {'Accept-Encoding': 'identity', **(info_dict.get('http_headers') or {})}
+
+        total = info_dict.get('filesize') or self._probe_size(url, headers)
+        if not total or total < 2 * chunk_size:
+            # Range qo'llanmaydi yoki fayl kichik — oddiy HTTP yuklovchi
+            return self._fallback(filename, info_dict)
+
+        tmpfilename = self.temp_name(filename)
+        state_path = tmpfilename + '.segments'
+        segments = [(i, start, min(start + chunk_size, total) - 1)
+                    for i, start in enumerate(range(0, total, chunk_size))]
+        done = self._load_state(tmpfilename, state_path, segments, total)
+
+        # Fayl oldindan to'liq hajmga ajratiladi, bo'laklar bitta fd orqali o'z joyiga yoziladi
+        start_time = time.time()
+        writer = OutputWriter(tmpfilename, total)
+        try:
+            self._download_segments(writer, filename, info_dict, url, headers, state_path, segments, done,
+                                    connections, total, start_time)
+        finally:
+            writer.close()   # Windows'da rename'dan oldin fd va mmap yopilgan bo'lishi kerak
+
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        self.try_rename(tmpfilename, filename)
+        self._hook_progress({
+            'filename': filename,
+            'status': 'finished',
+            'downloaded_bytes': total,
+            'total_bytes': total,
+            'elapsed': time.time() - start_time,
+        }, info_dict)
+        return True
+
+    def _download_segments(self, writer, filename, info_dict, url, headers, state_path, segments, done,
+                           connections, total, start_time):
+        tmpfilename = writer.path
+        factory = self.params.get('output_consumers')
+        if factory is not None:
+            for consumer in factory(filename, info_dict) or ():
+                writer.add_consumer(consumer)
+            writer.mark_existing((start, end + 1) for i, start, end in segments if i in done)
+
+        self.report_destination(filename)
+        lock = threading.Lock()
+        stop = threading.Event()
+        progress = {'bytes': sum(end - start + 1 for i, start, end in segments if i in done)}
+        start_bytes = progress['bytes']
+
+        def fetch(segment):
+            index, start, end = segment
+            for attempt in range(SEGMENT_RETRIES + 1):
+                counted = [0]
+                try:
+                    self._fetch_range(url, headers, writer, start, end, stop, lock, progress, counted)
+                    break
+                except Exception:
+                    # Bo'lak boshidan qayta yuklanadi, hisoblangan baytlarni qaytaramiz
+                    with lock:
+                        progress['bytes'] -= counted[0]
+                    if stop.is_set() or attempt == SEGMENT_RETRIES:
+                        raise
+                    time.sleep(1 + attempt)
+            with lock:
+                with open(state_path, 'a', encoding='utf-8') as f:
+                    f.write(f"{index}\n")
+            writer.mark_done(start, end + 1)
+
+        pending = [s for s in segments if s[0] not in done]
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            futures = {pool.submit(fetch, s) for s in pending}
+            while futures:
+                finished, futures = wait(futures, timeout=PROGRESS_INTERVAL, return_when=FIRST_EXCEPTION)
+                for fut in finished:
+                    if fut.exception() is not None:
+                        stop.set()
+                        for other in futures:
+                            other.cancel()
+                        raise fut.exception()
+                self._report_progress(filename, tmpfilename, info_dict, progress['bytes'], total,
+                                      start_time, start_bytes)
+
+    def _fetch_range(self, url, headers, writer, start, end, stop, lock, progress, counted):
+        response = self.ydl.urlopen(Request(url, headers={**headers, 'Range': f'bytes={start}-{end}'}))
+        try:
+            if response.status != 206:
+                raise yt_dlp.utils.DownloadError(f'server Range so\'rovini qo\'llamadi (HTTP {response.status})')
+            # Javob bloki to'g'ridan-to'g'ri pwrite bilan o'z offset'iga yoziladi (seek va bufer yo'q)
+            offset, remaining = start, end - start + 1
+            while remaining > 0:
+                if stop.is_set():
+                    raise yt_dlp.utils.DownloadError('bekor qilindi')
+                block = response.read(min(READ_BLOCK, remaining))
+                if not block:
+                    raise yt_dlp.utils.DownloadError(f'bo\'lak to\'liq kelmadi ({remaining} bayt qoldi)')
+                writer.pwrite(offset, block)
+                offset += len(block)
+                remaining -= len(block)
+                with lock:
+                    progress['bytes'] += len(block)
+                    counted[0] += len(block)
+        finally:
+            response.close()
+
+    def _probe_size(self, url, headers):
+        try:
+            response = self.ydl.urlopen(Request(url, headers={**headers, 'Range': 'bytes=0-0'}))
+        except Exception:
+            return None
+        try:
+            content_range = response.headers.get('Content-Range') or ''
+            if response.status == 206 and '/' in content_range:
+                total = content_range.rsplit('/', 1)[1]
+                return int(total) if total.isdigit() else None
+            return None
+        finally:
+            response.close()
+
+    @staticmethod
+    def _load_state(tmpfilename, state_path, segments, total):
+        if not os.path.isfile(tmpfilename):
+            return set()
+        if os.path.isfile(state_path):
+            with open(state_path, encoding='utf-8') as f:
+                return {int(line) for line in f if line.strip().isdigit()}
+        # Oddiy HttpFD qoldirgan .part: boshidagi to'liq bo'laklar tayyor hisoblanadi
+        size = os.path.getsize(tmpfilename)
+        if size >= total:
+            return set()
+        return {i for i, start, end in segments if end < size}
+
+    def _report_progress(self, filename, tmpfilename, info_dict, downloaded, total, start_time, start_bytes):
+        elapsed = time.time() - start_time
+        speed = (downloaded - start_bytes) / elapsed if elapsed > 0 else None
+        self._hook_progress({
+            'status': 'downloading',
+            'filename': filename,
+            'tmpfilename': tmpfilename,
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'elapsed': elapsed,
+            'speed': speed,
+            'eta': (total - downloaded) / speed if speed else None,
+        }, info_dict)
+
+    def _fallback(self, filename, info_dict):
+        # Oldindan kengaytirilgan segment .part fayli HttpFD uchun "tayyor" bo'lib ko'rinadi
+        tmpfilename = self.temp_name(filename)
+        if os.path.exists(tmpfilename + '.segments'):
+            os.remove(tmpfilename)
+            os.remove(tmpfilename + '.segments')
+        fd = HttpFD(self.ydl, self.params)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        return fd.real_download(filename, info_dict)
+
+
+# YoutubeDL.dl() progressive formatlar uchun SegmentedFD'ni tanlaydi,
+# audio job'larda 'stream_transcode' berilsa — StreamingTranscodeFD'ni (transcode.py),
+# qolgan hamma holatlar (DASH/HLS fragmentlar, subtitrlar) yt-dlp'ning o'zida qoladi.
+# 'parallel_streams' yoqilgan bo'lsa, requested_formats (video+audio) stream'lari
+# bir vaqtda yuklanadi: process_info ularni ketma-ket dl() qiladi, biz esa oxirgisidan
+# boshqalarini fon thread'iga berib darhol qaytamiz va oxirgisida hammasini kutamiz.
+# Shunday qilib merge (FFmpegMergerPP) ikkala stream tugashi bilan boshlanadi.
+class SegmentedYoutubeDL(yt_dlp.YoutubeDL):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._parallel_formats = []
+        self._parallel_futures = []
+        self._streams_executor = None
+
+    def pre_process(self, ie_info, key='pre_process', files_to_move=None):
+        # 'before_dl' har bir video uchun stream'lar yuklanishidan oldin bir marta chaqiriladi
+        if key == 'before_dl':
+            formats = ie_info.get('requested_formats') or []
+            self._parallel_formats = ([f['format_id'] for f in formats]
+                                      if self.params.get('parallel_streams') and len(formats) > 1 else [])
+            self._parallel_futures = []
+        return super().pre_process(ie_info, key, files_to_move)
+
+    def dl(self, name, info, subtitle=False, test=False):
+        plan = self._parallel_formats
+        if test or subtitle or name == '-' or info.get('format_id') not in plan:
+            return self._dl_one(name, info, subtitle, test)
+
+        if info['format_id'] != plan[-1]:
+            # Natija oxirgi stream bilan birga qaytariladi
+            self._parallel_futures.append(self._stream_pool().submit(self._dl_one, name, info))
+            return True, False
+
+        futures, self._parallel_futures, self._parallel_formats = self._parallel_futures, [], []
+        results, error = [], None
+        try:
+            results.append(self._dl_one(name, info))
+        except BaseException as e:
+            error = e
+        # Xato bo'lsa ham fon stream'lari tugashini kutamiz — .part fayllar yopilishi kerak
+        for fut in futures:
+            try:
+                results.append(fut.result())
+            except BaseException as e:
+                error = error or e
+        if error is not None:
+            raise error
+        return all(ok for ok, _ in results), any(real for _, real in results)
+
+    # 'http_pool' (engine.HttpPool) berilsa, ulanishlar va cookie'lar YoutubeDL nusxalari
+    # orasida umumiy bo'ladi: har bir job yangi TCP+TLS handshake qilmaydi
+    @functools.cached_property
+    def cookiejar(self):
+        pool = self.params.get('http_pool')
+        return pool.cookiejar() if pool is not None else yt_dlp.YoutubeDL.cookiejar.func(self)
+
+    @functools.cached_property
+    def _request_director(self):
+        pool = self.params.get('http_pool')
+        return pool.director(self) if pool is not None else yt_dlp.YoutubeDL._request_director.func(self)
+
+    # 'bandwidth' (engine.BandwidthChannel) berilsa, barcha HTTP javoblari — progressive,
+    # fragmentli va bo'laklab yuklashlar — umumiy tezlik scheduler'i orqali o'qiladi
+    def urlopen(self, req):
+        pool = self.params.get('http_pool')
+        if pool is None:
+            response = super().urlopen(req)
+        else:
+            with pool.bind(self):
+                response = super().urlopen(req)
+        channel = self.params.get('bandwidth')
+        if channel is not None:
+            response.read = channel.wrap(response.read)
+        return response
+
+    # 'defer_postprocess' berilsa, post-processing (merge, FFmpegExtractAudio) shu thread'da
+    # bajarilmaydi: qadam callable sifatida engine'ning alohida bosqichiga beriladi
+    def post_process(self, filename, info, files_to_move=None):
+        defer = self.params.get('defer_postprocess')
+        if defer is None:
+            return super().post_process(filename, info, files_to_move)
+        defer(functools.partial(super().post_process, filename, dict(info), files_to_move))
+        info['filepath'] = filename
+        return info
+
+    def _stream_pool(self):
+        if self._streams_executor is None:
+            self._streams_executor = ThreadPoolExecutor(max_workers=PARALLEL_STREAMS, thread_name_prefix='stream')
+        return self._streams_executor
+
+    def close(self):
+        if self._streams_executor is not None:
+            self._streams_executor.shutdown(wait=True)
+            self._streams_executor = None
+        if self.params.get('http_pool') is not None:
+            self.__dict__.pop('_request_director', None)   # umumiy director'ni HttpPool yopadi
+        super().close()
+
+    def _dl_one(self, name, info, subtitle=False, test=False):
+        if test or subtitle or name == '-' or not info.get('url'):
+            return super().dl(name, info, subtitle, test)
+        if StreamingTranscodeFD.can_download(info, self.params):
+            codec = self.params['stream_transcode']['codec']
+            success, real_download = self._run_fd(StreamingTranscodeFD, name, info)
+            if success:
+                # process_info shu info dict'ni post_process'ga beradi
+                info.setdefault('__postprocessors', []).append(
+                    StreamedAudioPP(self, output_path(name, info, codec), codec))
+            return success, real_download
+        if SegmentedFD.can_download(info, self.params):
+            return self._run_fd(SegmentedFD, name, info)
+        return super().dl(name, info, subtitle, test)
+
+    def _run_fd(self, fd_class, name, info):
+        fd = fd_class(self, self.params)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        new_info = self._copy_infodict(info)
+        if new_info.get('http_headers') is None:
+            new_info['http_headers'] = self._calc_headers(new_info)
+        return fd.download(name, new_info)
+
+
+# engine.HttpPool'ning umumiy RequestDirector'i shu nusxada yt-dlp'ning o'z yo'li bilan quriladi
+# (ro'yxatdan o'tgan barcha handler'lar va ularning afzalliklari). Nusxa hech qaysi job'ga
+# tegishli emas: cookie'lar pool'niki, handler xabarlari esa so'rovni yuborayotgan
+# thread'dagi YoutubeDL'ga (pool.bind) boradi — birinchi job'ning logger'iga emas.
+class PoolYoutubeDL(yt_dlp.YoutubeDL):
+    def __init__(self, pool, params):
+        self.pool = pool
+        super().__init__({**params, 'quiet': True}, auto_init=False)
+
+    @functools.cached_property
+    def cookiejar(self):
+        return self.pool.cookiejar()
+
+    def request_director(self):
+        return self._request_director
+
+    def write_debug(self, *args, **kwargs):
+        return self._forward('write_debug', args, kwargs)
+
+    def to_screen(self, *args, **kwargs):
+        return self._forward('to_screen', args, kwargs)
+
+    def report_warning(self, *args, **kwargs):
+        return self._forward('report_warning', args, kwargs)
+
+    def report_error(self, *args, **kwargs):
+        return self._forward('report_error', args, kwargs)
+
+    def to_stdout(self, *args, **kwargs):
+        return self._forward('to_stdout', args, kwargs)
+
+    def to_stderr(self, *args, **kwargs):
+        return self._forward('to_stderr', args, kwargs)
+
+    def _forward(self, name, args, kwargs):
+        ydl = self.pool.current()
+        return getattr(ydl if ydl is not None else super(), name)(*args, **kwargs)
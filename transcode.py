@@ -0,0 +1,165 @@
+# transcode.py
+# Audio rejimida yuklanayotgan baytlarni to'g'ridan-to'g'ri ffmpeg stdin'iga uzatib,
+# mp3'ni yuklash davomida kodlaydi. Oddiy yo'lda bestaudio avval diskka to'liq
+# yoziladi, keyin FFmpegExtractAudio uni qayta o'qib mp3 yozadi — bu yerda esa
+# tarmoq va CPU bir vaqtda ishlaydi va diskka faqat mp3 yoziladi.
+#
+# Stream qilib bo'lmaydigan formatlar (HLS/DASH fragmentlar, moov oxirida bo'lgan mp4)
+# odatdagidek yuklanadi va FFmpegExtractAudio o'zgarishsiz ishlaydi.
+
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+import yt_dlp
+from yt_dlp.downloader.common import FileDownloader
+from yt_dlp.networking import Request
+from yt_dlp.postprocessor.common import PostProcessor
+from yt_dlp.utils import determine_protocol, replace_extension
+
+from engine import FFMPEG_PATH
+
+READ_BLOCK = 64 * 1024
+PROGRESS_INTERVAL = 0.2                      # progress hook'lar orasidagi vaqt (soniya)
+STDERR_TAIL = 4096                           # xato xabari uchun ffmpeg stderr'ining oxiri (bayt)
+
+# Kodek nomi → ffmpeg encoder'i
+ENCODERS = {'mp3': 'libmp3lame'}
+# Pipe orqali o'qib bo'ladigan konteynerlar. Oddiy mp4/m4a'da moov atom fayl oxirida
+# bo'lishi mumkin, uni seek'siz dekodlab bo'lmaydi; YouTube'ning m4a'si esa DASH (fragmentli).
+STREAMABLE_EXTS = ('webm', 'weba', 'opus', 'ogg', 'mp3', 'aac')
+STREAMABLE_CONTAINERS = ('m4a_dash', 'webm_dash')
+
+
+def ffmpeg_executable():
+    if os.path.exists(FFMPEG_PATH):
+        return FFMPEG_PATH
+    return shutil.which('ffmpeg')
+
+
+def output_path(filename, info, codec):
+    return replace_extension(filename, codec, info.get('ext'))
+
+
+class StreamingTranscodeFD(FileDownloader):
+    FD_NAME = 'stream-transcode'
+
+    @staticmethod
+    def can_download(info, params):
+        opts = params.get('stream_transcode')
+        if not opts or opts.get('codec') not in ENCODERS:
+            return False
+        if info.get('fragments') or info.get('requested_formats') or info.get('acodec') == 'none':
+            return False
+        if info.get('ext') not in STREAMABLE_EXTS and info.get('container') not in STREAMABLE_CONTAINERS:
+            return False
+        if (info.get('protocol') or determine_protocol(info)) not in ('http', 'https'):
+            return False
+        return ffmpeg_executable() is not None
+
+    def real_download(self, filename, info_dict):
+        opts = self.params['stream_transcode']
+        codec = opts['codec']
+        target = output_path(filename, info_dict, codec)
+        # Yarim kodlangan mp3'ni davom ettirib bo'lmaydi — .part har safar boshidan yoziladi
+        tmpfilename = self.temp_name(target)
+        headers = {'Accept-Encoding': 'identity', **(info_dict.get('http_headers') or {})}
+
+        self.report_destination(target)
+        response = self.ydl.urlopen(Request(info_dict['url'], headers=headers))
+        total = info_dict.get('filesize') or int(response.headers.get('Content-Length') or 0) or None
+
+        # 'output_consumers' (segmented.py kabi) ffmpeg'ga ketayotgan asl baytlarni tartib bilan oladi
+        factory = self.params.get('output_consumers')
+        consumers = list(factory(filename, info_dict) or ()) if factory is not None else []
+
+        cmd = [ffmpeg_executable(), '-y', '-hide_banner', '-loglevel', 'error',
+               '-i', 'pipe:0', '-vn', '-c:a', ENCODERS[codec], '-b:a', f"{opts.get('quality', '192')}k",
+               '-f', codec, tmpfilename]
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        # stderr alohida thread'da o'qiladi, aks holda to'lgan pipe ffmpeg'ni to'xtatib qo'yadi
+        stderr = bytearray()
+        reader = threading.Thread(target=lambda: stderr.extend(proc.stderr.read()), daemon=True)
+        reader.start()
+
+        start_time = last_report = time.time()
+        downloaded = 0
+        try:
+            with response:
+                while True:
+                    block = response.read(READ_BLOCK)
+                    if not block:
+                        break
+                    proc.stdin.write(block)
+                    for consumer in consumers:
+                        consumer(block)
+                    downloaded += len(block)
+                    now = time.time()
+                    if now - last_report >= PROGRESS_INTERVAL:
+                        last_report = now
+                        self._report_progress(target, tmpfilename, info_dict, downloaded, total, start_time)
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass  # ffmpeg erta chiqib ketdi — sababi pastda stderr'dan olinadi
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            self._remove(tmpfilename)
+            raise
+        finally:
+            returncode = proc.wait()
+            reader.join()
+
+        if returncode != 0:
+            self._remove(tmpfilename)
+            message = bytes(stderr[-STDERR_TAIL:]).decode('utf-8', 'replace').strip()
+            raise yt_dlp.utils.DownloadError(f'ffmpeg xatosi ({returncode}): {message}')
+        if total and downloaded < total:
+            self._remove(tmpfilename)
+            raise yt_dlp.utils.ContentTooShortError(downloaded, total)
+
+        self.try_rename(tmpfilename, target)
+        self._hook_progress({
+            'filename': target,
+            'status': 'finished',
+            'downloaded_bytes': downloaded,
+            'total_bytes': downloaded,
+            'elapsed': time.time() - start_time,
+        }, info_dict)
+        return True
+
+    def _report_progress(self, filename, tmpfilename, info_dict, downloaded, total, start_time):
+        elapsed = time.time() - start_time
+        speed = downloaded / elapsed if elapsed > 0 else None
+        self._hook_progress({
+            'status': 'downloading',
+            'filename': filename,
+            'tmpfilename': tmpfilename,
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'elapsed': elapsed,
+            'speed': speed,
+            'eta': (total - downloaded) / speed if speed and total else None,
+        }, info_dict)
+
+    @staticmethod
+    def _remove(path):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# Stream qilingan job'da yt-dlp hali ham asl kengaytmali faylni kutadi:
+# bu PP filepath'ni tayyor mp3'ga almashtiradi, keyingi FFmpegExtractAudio esa
+# fayl allaqachon mp3 ekanini ko'rib, qayta kodlamaydi
+class StreamedAudioPP(PostProcessor):
+    def __init__(self, downloader, path, codec):
+        super().__init__(downloader)
+        self.path = path
+        self.codec = codec
+
+    def run(self, info):
+        info['filepath'] = self.path
+        info['ext'] = self.codec
+        return [], info
@@ -0,0 +1,130 @@
+# writer.py
+# Bo'laklab yuklanayotgan fayl uchun yozuvchi. Fayl oldindan to'liq hajmga ajratiladi
+# (posix_fallocate: disk to'lgani boshida ma'lum bo'ladi, fayl bo'laklarga bo'linib ketmaydi),
+# bo'laklar bitta fd orqali os.pwrite bilan o'z offset'iga yoziladi — har bo'lak uchun
+# open/seek yo'q va Python tomonida qo'shimcha bufer yo'q.
+#
+# Iste'molchilar (hash, ffmpeg pipe) faylning boshidan uzluksiz tayyor bo'lgan qismini
+# tartib bilan memoryview sifatida oladi. View read-only mmap ustida: ma'lumot nusxalanmaydi,
+# o'qilgan sahifalar esa madvise bilan jarayon xotirasidan (RSS) chiqariladi.
+#
+# yt_dlp'ga bog'liq emas — segmented.py va bench'lar uchun.
+
+import os
+import mmap
+import errno
+import threading
+
+CONSUMER_BLOCK = 8 * 1024 * 1024             # iste'molchiga bir martada beriladigan view hajmi
+_HAS_PWRITE = hasattr(os, 'pwrite')
+
+
+class OutputWriter:
+    # size — faylning yakuniy hajmi; mavjud fayl (davom ettirish) saqlanib qoladi
+    def __init__(self, path, size, preallocate=True):
+        self.path = path
+        self.size = size
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        self._lock = threading.Lock()            # pwrite bo'lmasa seek+write, va iste'molchilar
+        self._consumers = []
+        self._ready = {}                         # tayyor, lekin hali uzluksiz bo'lmagan: boshi → oxiri
+        self._watermark = 0                      # [0, watermark) iste'molchilarga berilgan
+        self._map = None
+        try:
+            self._allocate(size, preallocate)
+        except BaseException:
+            os.close(self.fd)
+            raise
+
+    def _allocate(self, size, preallocate):
+        if preallocate and hasattr(os, 'posix_fallocate') and size:
+            try:
+                os.posix_fallocate(self.fd, 0, size)
+                return
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    raise
+                # EOPNOTSUPP/EINVAL: fayl tizimi qo'llamaydi (masalan ba'zi tarmoq disklari)
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # data — bytes/bytearray/memoryview; qisqa yozuvlar tugaguncha takrorlanadi
+    def pwrite(self, offset, data):
+        view = memoryview(data)
+        while view:
+            if _HAS_PWRITE:
+                written = os.pwrite(self.fd, view, offset)
+            else:
+                with self._lock:
+                    os.lseek(self.fd, offset, os.SEEK_SET)
+                    written = os.write(self.fd, view)
+            view = view[written:]
+            offset += written
+
+    # consumer(memoryview) faylning boshidan boshlab, tartib bilan, tayyor bo'lgan qismlarni oladi.
+    # View faqat chaqiruv davomida amal qiladi — saqlab qo'yish kerak bo'lsa nusxa oling.
+    def add_consumer(self, consumer):
+        self._consumers.append(consumer)
+
+    # [start, end) to'liq yozildi. Uzluksiz qism kengaysa iste'molchilar shu thread'da chaqiriladi
+    def mark_done(self, start, end):
+        with self._lock:
+            self._ready[start] = end
+            if not self._consumers:
+                return
+            first = self._watermark
+            while self._watermark in self._ready:
+                self._watermark = self._ready.pop(self._watermark)
+            if self._watermark > first:
+                self._feed(first, self._watermark)
+
+    # Oldingi sessiyada yozilgan bo'laklar uchun (davom ettirish): tartib bilan qayta beriladi
+    def mark_existing(self, ranges):
+        for start, end in sorted(ranges):
+            self.mark_done(start, end)
+
+    # Tayyor qismga read-only memoryview (chaqiruvchi release() qilishi kerak)
+    def view(self, start, end):
+        return memoryview(self._mapping())[start:end]
+
+    def _mapping(self):
+        if self._map is None:
+            self._map = mmap.mmap(self.fd, self.size, access=mmap.ACCESS_READ)
+        return self._map
+
+    def _feed(self, start, end):
+        mapping = self._mapping()
+        with memoryview(mapping) as whole:
+            for pos in range(start, end, CONSUMER_BLOCK):
+                stop = min(pos + CONSUMER_BLOCK, end)
+                with whole[pos:stop] as part:
+                    for consumer in self._consumers:
+                        consumer(part)
+                self._drop_pages(mapping, pos, stop)
+
+    @staticmethod
+    def _drop_pages(mapping, start, end):
+        # Fayl sahifalari page cache'da qoladi, faqat bu jarayonning RSS'idan chiqadi
+        if not hasattr(mapping, 'madvise') or not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        start -= start % mmap.PAGESIZE
+        if end > start:
+            mapping.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+    @property
+    def complete(self):
+        return self._watermark >= self.size
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None